@@ -0,0 +1,489 @@
+#==============================================================================
+# author 			: Andreas Hauser
+# contact 			: andreas_hauser@artc.a-star.edu.sg
+# title				: benchmark.py
+# description		: Time readCalibrationData and writeData of report_gen.py
+#                     on synthetic caldata.DB and channel.DB tables, the
+#                     startup time of report_gen.py, and check ParadoxReader
+#                     against pypxlib
+# date				: 11/09/2024
+# version			: 1.1.1
+# dependencies		: argparse, sys, os, datetime, io, contextlib, tempfile, time, itertools, subprocess, report_gen
+# external deps     : see report_gen.py
+# usage				: Run with -h parameter for help
+# notes				: The synthetic tables are generated on access and need no
+#                     memory, real Paradox files are slower to decode
+#==============================================================================
+
+import sys
+import os
+import argparse
+import datetime
+import io
+import contextlib
+import tempfile
+import time
+import itertools
+import subprocess
+import report_gen
+
+
+###############################################################################
+# Constants definitions
+###############################################################################
+
+# Scale of the default run, every axis is swept with the other two at the base value
+BASE_DEVICES = 10
+BASE_CHANNELS = 32
+BASE_YEARS = 1
+SWEEP_DEVICES = (1, 10, 100, 500)
+SWEEP_CHANNELS = (8, 32, 128)
+SWEEP_YEARS = (1, 5, 10)
+
+FIRST_YEAR = 2015
+
+# Records per channel and calibration (entries 1 - 21, pre and post measurement)
+ROWS_PER_CHANNEL = 42
+
+RANGE_NAMES = ('POST CAL', 'PRE CAL')
+
+
+
+###############################################################################
+# Synthetic tables
+###############################################################################
+
+def pseudoRandom(rowNumber, column):
+    # Deterministic value in [0, 1) for a row and column, the same on every run
+    return ((rowNumber * 2654435761 + column * 40503) % 4294967296) / 4294967296
+# end def
+
+def calibrationDate(deviceId, year):
+    # Every device is calibrated once a year, spread over the year
+    return datetime.datetime(FIRST_YEAR + year, 1 + deviceId % 12, 1 + deviceId % 28, 10, 0)
+# end def
+
+def channelId(deviceId, channelNumber):
+    return str(deviceId) + ' CH' + ('' if channelNumber > 9 else '0') + str(channelNumber) + ' CTS'
+# end def
+
+
+class SyntheticCalData:
+    # Same interface as pypxlib.Table for caldata.DB: len(), table[i], iteration and row['Field']
+    # Rows are ordered by year, device, channel, entry number and pre/post measurement
+    def __init__(self, numDevices, numChannels, numYears):
+        self.numDevices = numDevices
+        self.numChannels = numChannels
+        self.numYears = numYears
+    # end def
+
+    def __len__(self):
+        return self.numYears * self.numDevices * self.numChannels * ROWS_PER_CHANNEL
+    # end def
+
+    def __getitem__(self, rowNumber):
+        if rowNumber < 0:
+            rowNumber = rowNumber + len(self)
+        # end if
+        if rowNumber < 0 or rowNumber >= len(self):
+            raise IndexError(rowNumber)
+        # end if
+        return SyntheticCalDataRow(self, rowNumber)
+    # end def
+
+    def __iter__(self):
+        for rowNumber in range(0, len(self)):
+            yield SyntheticCalDataRow(self, rowNumber)
+        # end for
+    # end def
+
+    def close(self):
+        pass
+    # end def
+# end class
+
+
+class SyntheticCalDataRow:
+    __slots__ = ('table', 'rowNumber')
+
+    def __init__(self, table, rowNumber):
+        self.table = table
+        self.rowNumber = rowNumber
+    # end def
+
+    def __getitem__(self, field):
+        table = self.table
+        rest, record = divmod(self.rowNumber, ROWS_PER_CHANNEL)
+        rest, channelNumber = divmod(rest, table.numChannels)
+        year, device = divmod(rest, table.numDevices)
+        deviceId = device + 1
+
+        if field == 'Date':
+            return calibrationDate(deviceId, year)
+        elif field == 'Channel_Id':
+            return channelId(deviceId, channelNumber)
+        elif field == 'No':
+            # Even channels use entry 1 - 21, odd channels entry 22 - 42
+            return record // 2 + (1 if channelNumber % 2 == 0 else 22)
+        elif field == 'Range':
+            return RANGE_NAMES[record % 2]
+        # end if
+
+        refValue = -5 + 10 * pseudoRandom(self.rowNumber, 0)
+        error = (pseudoRandom(self.rowNumber, 1) - 0.5) * 0.005
+        if field == 'Ref_value':
+            return refValue
+        elif field == 'Meas_value':
+            return refValue + error
+        elif field == 'Error':
+            return error
+        elif field == 'Tolerance':
+            return 0.002
+        # end if
+        raise KeyError(field)
+    # end def
+# end class
+
+
+class SyntheticChannelFile:
+    # Same interface as pypxlib.Table for channel.DB, one row per channel of every device
+    def __init__(self, numDevices, numChannels):
+        self.numDevices = numDevices
+        self.numChannels = numChannels
+    # end def
+
+    def __len__(self):
+        return self.numDevices * self.numChannels
+    # end def
+
+    def __getitem__(self, rowNumber):
+        if rowNumber < 0:
+            rowNumber = rowNumber + len(self)
+        # end if
+        if rowNumber < 0 or rowNumber >= len(self):
+            raise IndexError(rowNumber)
+        # end if
+        return SyntheticChannelRow(self, rowNumber)
+    # end def
+
+    def __iter__(self):
+        for rowNumber in range(0, len(self)):
+            yield SyntheticChannelRow(self, rowNumber)
+        # end for
+    # end def
+
+    def close(self):
+        pass
+    # end def
+# end class
+
+
+class SyntheticChannelRow:
+    __slots__ = ('table', 'rowNumber')
+
+    def __init__(self, table, rowNumber):
+        self.table = table
+        self.rowNumber = rowNumber
+    # end def
+
+    def __getitem__(self, field):
+        device, channelNumber = divmod(self.rowNumber, self.table.numChannels)
+        if field == 'Id':
+            return channelId(device + 1, channelNumber)
+        elif field in report_gen.CHANNEL_FACTOR_COLUMNS:
+            column = report_gen.CHANNEL_FACTOR_COLUMNS.index(field)
+            if field.startswith('Fak'):
+                return 0.9 + 0.2 * pseudoRandom(self.rowNumber, column)
+            # end if
+            return (pseudoRandom(self.rowNumber, column) - 0.5) * 0.02
+        # end if
+        raise KeyError(field)
+    # end def
+# end class
+
+
+###############################################################################
+# Benchmark
+###############################################################################
+
+def readCommandLineArgs():
+    '''
+    Read command line parameters
+    '''
+    scriptDir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description='Benchmark report_gen.py on synthetic calibration data - Ver.: ' + report_gen.VERSION)
+    parser.add_argument('--devices',
+                        required=False,
+                        default=None,
+                        help='Comma separated numbers of devices (Default: ' + ','.join(str(value) for value in SWEEP_DEVICES) + ')')
+    parser.add_argument('--channels',
+                        required=False,
+                        default=None,
+                        help='Comma separated numbers of channels per device (Default: ' + ','.join(str(value) for value in SWEEP_CHANNELS) + ')')
+    parser.add_argument('--years',
+                        required=False,
+                        default=None,
+                        help='Comma separated years of history (Default: ' + ','.join(str(value) for value in SWEEP_YEARS) + ')')
+    parser.add_argument('--grid',
+                        required=False,
+                        action='store_true',
+                        help='Run every combination of devices, channels and years instead of sweeping one axis at a time (Default: false)')
+    parser.add_argument('-r',
+                        '--repeat',
+                        required=False,
+                        type=int,
+                        default=3,
+                        help='Runs per scale, the fastest one is reported (Default: 3)')
+    parser.add_argument('-e',
+                        '--equipment',
+                        required=False,
+                        default=os.path.join(scriptDir, 'equipment.ini'),
+                        help='Calibration equipment data [equiptment.ini]')
+    parser.add_argument('-t',
+                        '--template',
+                        required=False,
+                        default=os.path.join(scriptDir, 'CalReport_template.typ'),
+                        help='Template for calibration report [*.typst]')
+    parser.add_argument('--startup',
+                        required=False,
+                        action='store_true',
+                        help='Measure the startup time of report_gen.py with -h and --check instead (Default: false)')
+    parser.add_argument('--checkparadox',
+                        required=False,
+                        nargs='+',
+                        default=None,
+                        help='Check that ParadoxReader reads the same records as pypxlib from these Paradox files (e.g. caldata.DB channel.DB) instead')
+    parser.add_argument('-o',
+                        '--output',
+                        required=False,
+                        default=None,
+                        help='Also write the results to this file')
+
+    return parser.parse_args()
+# end def
+
+def parseList(value, default):
+    if value is None:
+        return default
+    # end if
+    return tuple(int(item) for item in value.split(','))
+# end def
+
+def getScales(args):
+    devices = parseList(args.devices, SWEEP_DEVICES)
+    channels = parseList(args.channels, SWEEP_CHANNELS)
+    years = parseList(args.years, SWEEP_YEARS)
+    if args.grid:
+        return list(itertools.product(devices, channels, years))
+    # end if
+
+    scales = []
+    for scale in [(value, BASE_CHANNELS, BASE_YEARS) for value in devices] + \
+                 [(BASE_DEVICES, value, BASE_YEARS) for value in channels] + \
+                 [(BASE_DEVICES, BASE_CHANNELS, value) for value in years]:
+        if scale not in scales:
+            scales.append(scale)
+        # end if
+    # end for
+    return scales
+# end def
+
+def createSettings(args, numDevices, numChannels, numYears, outputDir):
+    # Report of the last device at its last calibration
+    settings = report_gen.Settings()
+    settings.template = args.template
+    settings.calData = 'synthetic caldata.DB'
+    settings.channelFile = 'synthetic channel.DB'
+    settings.calEquipmentFile = args.equipment
+    settings.getCalEquipmentFromFile()
+    settings.numChannels = numChannels
+    settings.reportNumber = 'BENCH-' + str(numDevices) + '-' + str(numChannels) + '-' + str(numYears)
+    settings.setSerial('CTS.' + str(numDevices))
+    calDate = calibrationDate(numDevices, numYears - 1)
+    settings.setCalDate(calDate.strftime('%d/%m/%Y'))
+    settings.setReceivedDate(calDate.strftime('%d/%m/%Y'))
+    settings.clientName = 'Benchmark'
+    settings.clientAddress1 = ''
+    settings.clientAddress2 = ''
+    settings.clientAddress3 = ''
+    settings.calByName = 'Benchmark'
+    settings.calByTitle = ''
+    settings.approvedByName = 'Benchmark'
+    settings.approvedByTitle = ''
+    settings.outputFile = os.path.join(outputDir, settings.reportNumber + '.typ')
+    return settings
+# end def
+
+def runScale(args, numDevices, numChannels, numYears, outputDir):
+    # Fastest of args.repeat runs, every run starts with unindexed tables like a fresh start of report_gen.py
+    settings = createSettings(args, numDevices, numChannels, numYears, outputDir)
+    template = report_gen.readTemplate(settings)
+    readTimes = []
+    writeTimes = []
+    for run in range(0, args.repeat):
+        backend = report_gen.ParadoxBackend(settings.calData, settings.channelFile)
+        backend.calData = SyntheticCalData(numDevices, numChannels, numYears)
+        backend.channelFile = SyntheticChannelFile(numDevices, numChannels)
+        source = report_gen.CalDataSource(backend)
+        cts = report_gen.CTS(settings, source)
+        writer = report_gen.ReportWriter(settings)
+
+        # Same path as report_gen.py: the channel arrays are written while the channels are read, the rest of the report afterwards
+        # The progress bar of readCalibrationData is not shown
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            report_gen.readCalibrationData(settings, cts, writer)
+            readTimes.append(time.perf_counter() - start)
+        # end with
+
+        start = time.perf_counter()
+        report_gen.writeData(settings, cts, template, writer)
+        writeTimes.append(time.perf_counter() - start)
+    # end for
+
+    return len(backend.calData), min(readTimes), min(writeTimes)
+# end def
+
+def measureStartup(args):
+    # Fastest of args.repeat starts of report_gen.py in a new interpreter
+    # --check gets empty files for caldata.DB and channel.DB, it must not open them
+    scriptFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_gen.py')
+    outputDir = tempfile.mkdtemp(prefix='report_gen_bench_')
+    calDataFile = os.path.join(outputDir, 'caldata.DB')
+    channelFile = os.path.join(outputDir, 'channel.DB')
+    for fileName in (calDataFile, channelFile):
+        open(fileName, 'wb').close()
+    # end for
+
+    # python -m loads report_gen from its compiled module cache, a script is compiled on every start
+    checkArguments = ['--check', '-d', calDataFile, '-c', channelFile, '-e', args.equipment, '-t', args.template]
+    lines = ['{:<22}{:>14}'.format('Command', 'Startup [ms]')]
+    print(lines[0])
+    for name, command in (('report_gen.py -h', [scriptFile, '-h']),
+                          ('report_gen.py --check', [scriptFile] + checkArguments),
+                          ('-m report_gen -h', ['-m', 'report_gen', '-h']),
+                          ('-m report_gen --check', ['-m', 'report_gen'] + checkArguments)):
+        times = []
+        for run in range(0, args.repeat):
+            start = time.perf_counter()
+            result = subprocess.run([sys.executable] + command, capture_output=True, text=True, cwd=os.path.dirname(scriptFile))
+            times.append(time.perf_counter() - start)
+            if result.returncode != 0:
+                raise ValueError('report_gen.py ' + name + ' failed: ' + (result.stdout + result.stderr).strip())
+            # end if
+        # end for
+        lines.append('{:<22}{:>14.1f}'.format(name, min(times) * 1000))
+        print(lines[-1])
+    # end for
+
+    for fileName in (calDataFile, channelFile):
+        os.remove(fileName)
+    # end for
+    os.rmdir(outputDir)
+    return lines
+# end def
+
+def checkParadox(args):
+    # Every field of every record, compared row by row with repr so -0.0 and None are told apart
+    # Values pypxlib cannot decode itself are counted, not compared
+    lines = ['{:<30}{:>10}{:>12}{:>14}'.format('File', 'Rows', 'Mismatches', 'Not decoded')]
+    print(lines[0])
+    passed = True
+    for fileName in args.checkparadox:
+        table = report_gen.Table(fileName, px_encoding='cp1252')
+        reader = report_gen.ParadoxReader(fileName)
+        names = list(table.fields)
+        decoders = [reader.field(name) for name in names]
+
+        numRows = 0
+        mismatches = 0
+        notDecoded = 0
+        for recordOffset, row in itertools.zip_longest(reader.records(), table):
+            numRows = numRows + 1
+            if recordOffset is None or row is None:
+                mismatches = mismatches + 1
+                continue
+            # end if
+            for name, (offset, size, decode) in zip(names, decoders):
+                try:
+                    expected = row[name]
+                except ValueError:
+                    notDecoded = notDecoded + 1
+                    continue
+                # end exception
+                if repr(decode(reader.buffer[recordOffset + offset:recordOffset + offset + size])) != repr(expected):
+                    mismatches = mismatches + 1
+                    if mismatches <= 5:
+                        print('  row ' + str(numRows - 1) + ', ' + name + ': ' + repr(decode(reader.buffer[recordOffset + offset:recordOffset + offset + size])) + ' != ' + repr(expected))
+                    # end if
+                # end if
+            # end for
+        # end for
+        reader.close()
+        table.close()
+
+        passed = passed and mismatches == 0
+        lines.append('{:<30}{:>10}{:>12}{:>14}'.format(os.path.basename(fileName), numRows, mismatches, notDecoded))
+        print(lines[-1])
+    # end for
+    return lines, passed
+# end def
+
+def main():
+    args = readCommandLineArgs()
+    if args.checkparadox is not None:
+        lines, passed = checkParadox(args)
+        if args.output is not None:
+            f = open(args.output, 'w', encoding='utf-8')
+            f.write('\n'.join(lines) + '\n')
+            f.close()
+        # end if
+        if not passed:
+            sys.exit(1)
+        # end if
+        return
+    # end if
+    if args.startup:
+        lines = measureStartup(args)
+        if args.output is not None:
+            f = open(args.output, 'w', encoding='utf-8')
+            f.write('\n'.join(lines) + '\n')
+            f.close()
+        # end if
+        return
+    # end if
+
+    header = '{:>8}{:>10}{:>7}{:>12}{:>12}{:>14}{:>12}'.format('Devices', 'Channels', 'Years', 'Rows', 'Read [s]', 'Rows/s', 'Write [ms]')
+    lines = [header]
+    print(header)
+
+    outputDir = tempfile.mkdtemp(prefix='report_gen_bench_')
+    for numDevices, numChannels, numYears in getScales(args):
+        numRows, readSeconds, writeSeconds = runScale(args, numDevices, numChannels, numYears, outputDir)
+        line = '{:>8}{:>10}{:>7}{:>12}{:>12.3f}{:>14.0f}{:>12.2f}'.format(numDevices, numChannels, numYears, numRows, readSeconds, numRows / readSeconds, writeSeconds * 1000)
+        lines.append(line)
+        print(line)
+        sys.stdout.flush()
+    # end for
+
+    for fileName in os.listdir(outputDir):
+        os.remove(os.path.join(outputDir, fileName))
+    # end for
+    os.rmdir(outputDir)
+
+    if args.output is not None:
+        f = open(args.output, 'w', encoding='utf-8')
+        f.write('\n'.join(lines) + '\n')
+        f.close()
+    # end if
+# end def
+
+
+###############################################################################
+# Script entry point
+###############################################################################
+
+if __name__ == '__main__':
+    main()
+    sys.exit(0)
+# end if
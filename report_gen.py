@@ -6,10 +6,13 @@
 #                     Calibration report in typst format
 # date				: 11/09/2024
 # version			: 1.1.1
-# dependencies		: argparse, sys, os, datetime, configparser, math
-# external deps     : colorful-terminal, pypxlib
+# dependencies		: argparse, sys, os, datetime, configparser, re, time, io, struct, copy, array, collections, math, importlib,
+#                     imported when used: csv (-b, --trend, --scan, --factordiff), hashlib and sqlite3 (--cache, --source, --convert),
+#                     json, mmap (--direct), shutil and subprocess (--pdf), cProfile (--cprofile), http.server (--serve), concurrent.futures (--pdf)
+# external deps     : colorful-terminal, pypxlib, numpy (optional), typst (optional, or typst binary), pyarrow (optional)
 # usage				: Run with -h parameter for help
 # notes				: Quality = abs(error)/tolerance * 100
+#                     python -m report_gen starts faster than report_gen.py, it uses the compiled module cache
 #==============================================================================
 
 import sys
@@ -17,9 +20,74 @@ import os
 import argparse
 import datetime
 import configparser
+import re
+import time
+import io
+import struct
+import copy
+from array import array
+from collections.abc import Mapping
 from math import sqrt
-from colorful_terminal import colored_print, Fore, Style
-from pypxlib import Table
+import importlib
+
+
+###############################################################################
+# Deferred imports
+#
+# The external packages are imported when they are first used, so -h, --check
+# and errors in the settings do not pay for loading them
+###############################################################################
+
+class LazyImport:
+    # Stands in for a name of a package until it is first used
+    def __init__(self, moduleName, name):
+        self.moduleName = moduleName
+        self.name = name
+        self.value = None
+    # end def
+
+    def resolve(self):
+        if self.value is None:
+            self.value = getattr(importlib.import_module(self.moduleName), self.name)
+        # end if
+        return self.value
+    # end def
+
+    def __getattr__(self, attribute):
+        return getattr(self.resolve(), attribute)
+    # end def
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+    # end def
+# end class
+
+colored_print = LazyImport('colorful_terminal', 'colored_print')
+Fore = LazyImport('colorful_terminal', 'Fore')
+Style = LazyImport('colorful_terminal', 'Style')
+Table = LazyImport('pypxlib', 'Table')
+
+# Optional packages by name, None if not installed
+optionalModules = {}
+
+def optionalModule(name):
+    if name not in optionalModules:
+        try:
+            optionalModules[name] = importlib.import_module(name)
+        except ImportError:
+            optionalModules[name] = None
+        # end try
+    # end if
+    return optionalModules[name]
+# end def
+
+def importPyarrow():
+    # pyarrow with its parquet module, None if not installed
+    if optionalModule('pyarrow.parquet') is None:
+        return None
+    # end if
+    return optionalModule('pyarrow')
+# end def
 
 
 ###############################################################################
@@ -40,6 +108,87 @@ CTS_RESOLUTION_I3 = 10 / 1000
 CTS_RESOLUTION_I4 = 0.2 / 1000
 CTS_RESOLUTION_U = 0.3 / 1000
 
+# Formats of the channel array written into the report, one row per entry (see CalReport_template.typ)
+# (entry number, value format, as found deviation format, as left deviation format)
+CHANNEL_ARRAY_ENTRIES = (
+    (1, '"{:7.6f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I1 -90
+    (2, '"{:7.6f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I1 -10
+    (3, '"{:7.6f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I1 10
+    (4, '"{:7.6f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I1 90
+    (5, '"{:7.5f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I2 -90
+    (6, '"{:7.6f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I2 -10
+    (7, '"{:7.6f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I2 10
+    (8, '"{:7.5f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),      # I2 90
+    (9, '"{:7.6f} A",\n', '"{:.6f} A",\n', '"{:.6f} A",\n'),         # I3 -90
+    (10, '"{:7.5f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),     # I3 -10
+    (11, '"{:7.5f} mA",\n', '"{:.6f} mA",\n', '"{:.6f} mA",\n'),     # I3 10
+    (12, '"{:7.6f} A",\n', '"{:.6f} A",\n', '"{:.6f} A",\n'),        # I3 90
+    (13, '"{:7.6f} A",\n', '"{:.6f} A",\n', '"{:.6f} A",\n'),        # I4 -90
+    (14, '"{:7.6f} A",\n', '"{:.6f} A",\n', '"{:.6f} A",\n'),        # I4 -10
+    (15, '"{:7.6f} A",\n', '"{:.6f} A",\n', '"{:.6f} A",\n'),        # I4 10
+    (16, '"{:7.6f} A",\n', '"{:.6f} A",\n', '"{:.6f} A",\n'),        # I4 90
+    (17, '"{:7.6f} V",\n', '"{:.6f} V",\n', '"{:.6f} V",\n'),        # U 10
+    (18, '"{:7.6f} V",\n', '"{:.6f} V",\n', '"{:.6f} V",\n'),        # U 50
+    (19, '"{:7.6f} V",\n', '"{:.6f} V",\n', '"{:.6f} V",\n'),        # U 90
+    (20, '"{:5.3f} °C",\n', '"{:.4f} V",\n', '"{:5.3f} °C",\n'),     # T r1
+    (21, '"{:5.3f} °C",\n', '"{:.4f} V",\n', '"{:5.3f} °C",\n'),     # T r2
+)
+
+# Factors and offsets at the end of the channel array (factor key, field, format)
+CHANNEL_FACTOR_LAYOUT = (
+    ('I1', 'factor', '"{:19.18f}", '), ('I1', 'offset', '"{:19.18f}",\n'),
+    ('I2', 'factor', '"{:19.18f}", '), ('I2', 'offset', '"{:19.18f}",\n'),
+    ('I3', 'factor', '"{:19.18f}", '), ('I3', 'offset', '"{:19.18f}",\n'),
+    ('I4', 'factor', '"{:19.18f}", '), ('I4', 'offset', '"{:19.18f}",\n'),
+    ('U', 'factor', '"{:19.18f}", '), ('U', 'offset', '"{:19.18f}",\n'),
+    ('T', 'factor', '"{:6.5f}", '), ('T', 'offset', '"{:6.5f}",\n'),
+)
+
+# Parameters written in front of the template by writeParameters, the template has to use all of them
+REPORT_PARAMETERS = ('signer_name', 'signer_title', 'calibrated_by', 'calibrated_by_title', 'report_number', 'submitter_company', 'submitter_company_address',
+                     'tester_model', 'tester_serial', 'tester_id', 'date_received', 'date_calibrated', 'date_recommended', 'calibration_sop', 'calibration_sop_date',
+                     'software_version', 'multimeter_due', 'multimeter_report', 'calibrator_due', 'calibrator_report', 'condition_received_tolerance',
+                     'condition_received_remark', 'condition_shipped_tolerance', 'condition_shipped_remark')
+
+# Functions the template has to define
+TEMPLATE_FUNCTIONS = ('makechannel',)
+
+# Fields stored for every measurement record (see ChannelRecords)
+RECORD_FIELDS = ('refValue', 'measValue', 'error', 'tolerance', 'uncertainty')
+
+# Columns required in a batch manifest (optional column: Channels)
+MANIFEST_COLUMNS = ('Serial', 'ReportNumber', 'ReceivedDate', 'CalDate', 'ClientName', 'ClientAddress1', 'ClientAddress2', 'ClientAddress3', 'CalByName', 'CalByTitle', 'ApprovedByName', 'ApprovedByTitle')
+
+# Columns of caldata.DB used by the report, in the order they are returned by CTS.streamCalData
+CALDATA_COLUMNS = ('Date', 'Channel_Id', 'No', 'Range', 'Ref_value', 'Meas_value', 'Error', 'Tolerance')
+
+# Columns of channel.DB holding the calibration factors and offsets
+CHANNEL_FACTOR_COLUMNS = ('Fak0', 'Fak1', 'Fak2', 'Fak3', 'Fak4', 'Fak5', 'Off0', 'Off1', 'Off2', 'Off3', 'Off4', 'Off5')
+
+# Range of the report, factor column and offset column of channel.DB, in the order of CTSChannel.setFactors
+CHANNEL_FACTOR_RANGES = (('I1', 'Fak0', 'Off0'), ('I2', 'Fak4', 'Off4'), ('I3', 'Fak5', 'Off5'), ('I4', 'Fak2', 'Off2'), ('U', 'Fak1', 'Off1'), ('T', 'Fak3', 'Off3'))
+
+# Rows of caldata.DB between two updates of the read rate shown with --profile
+PROFILE_PROGRESS_ROWS = 20000
+
+# Rows per row group of the Parquet files written by --convert
+CONVERT_BATCH_ROWS = 100000
+
+# Paradox field types decoded by ParadoxReader (same numbers as in pxlib)
+PARADOX_ALPHA = 0x01
+PARADOX_DATE = 0x02
+PARADOX_SHORT = 0x03
+PARADOX_LONG = 0x04
+PARADOX_CURRENCY = 0x05
+PARADOX_NUMBER = 0x06
+PARADOX_LOGICAL = 0x09
+PARADOX_TIME = 0x14
+PARADOX_TIMESTAMP = 0x15
+PARADOX_AUTOINC = 0x16
+
+# pypxlib decodes alpha values with its default encoding (px_encoding is only used for the field names)
+PARADOX_VALUE_ENCODING = 'cp850'
+
 ###############################################################################
 # Uncertainty calculations
 # 
@@ -76,7 +225,17 @@ class Settings:
         self.template = None
         self.calData= None
         self.channelFile = None
+        self.dataSource = None
+        self.convertTo = None
+        self.trendFiles = None
+        self.scanFiles = None
+        self.scanFrom = None
+        self.scanTo = None
+        self.factorDiff = None
+        self.diffFiles = None
+        self.direct = False
         self.numChannels = DEFAULT_CHANNELS
+        self.jobs = 1
         self.reportNumber = None
         self.verbose = False
         self.serialNumber = None
@@ -103,17 +262,35 @@ class Settings:
         self.calUncertaintyCalibrator = None
         self.calValueMOhmCalibrator = None
         self.outputFile = None
+        self.batchFile = None
+        self.cacheDir = None
+        self.force = False
+        self.check = False
+        self.jobFile = None
+        self.pdf = False
+        self.split = False
+        self.servePort = None
+        self.typstCompiler = None
+        self.profile = False
+        self.profileJsonFile = None
+        self.cProfileFile = None
+        # Report details given on the command line or in the job file (keys as in MANIFEST_COLUMNS)
+        self.presets = {}
     # end def
 
     def __str__(self):
         return (
-            'CalData: ' + self.calData + '\n' + \
+            'CalData: ' + (self.calData if self.calData is not None else 'NONE') + '\n' + \
             'Template: ' + self.template + '\n' + \
-            'Channel file: ' + self.channelFile + '\n' + \
+            'Channel file: ' + (self.channelFile if self.channelFile is not None else 'NONE') + '\n' + \
+            'Data source: ' + (self.dataSource if self.dataSource is not None else 'NONE') + '\n' + \
             '------------------------\n' + \
             'Serial number: ' + self.serialNumber + '\n' + \
             'Device ID: ' + str(self.deviceId) + '\n' + \
             'Number of channels: ' + str(self.numChannels) + '\n' + \
+            'Parallel PDF compilers: ' + str(self.jobs) + '\n' + \
+            'Cache directory: ' + (self.cacheDir if self.cacheDir is not None else 'NONE') + '\n' + \
+            'Profile: ' + ('TRUE' if self.profile else 'FALSE') + '\n' + \
             'Received date: ' + self.receivedDate.strftime('%d/%m/%Y') + '\n' + \
             'Calibration date: ' + self.calDate.strftime('%d/%m/%Y') + '\n' + \
             'Calibration due date: ' + self.recommendedNextCal.strftime('%d/%m/%Y') + '\n' + \
@@ -148,49 +325,110 @@ class Settings:
         self.calData = commandLineArgs.caldata
         self.template = commandLineArgs.template
         self.channelFile = commandLineArgs.channelfile
+        self.dataSource = commandLineArgs.source
+        self.convertTo = commandLineArgs.convert
+        self.trendFiles = commandLineArgs.trend
+        self.scanFiles = commandLineArgs.scan
+        self.factorDiff = commandLineArgs.factordiff
+        self.diffFiles = commandLineArgs.diffoutput
+        if commandLineArgs.scanfrom is not None:
+            self.scanFrom = parseDate(commandLineArgs.scanfrom, '--scanfrom')
+        # end if
+        if commandLineArgs.scanto is not None:
+            self.scanTo = parseDate(commandLineArgs.scanto, '--scanto')
+        # end if
+        self.direct = commandLineArgs.direct
         self.calEquipmentFile = commandLineArgs.equipment
         if commandLineArgs.numchannels > 0:
             self.numChannels = commandLineArgs.numchannels
         # end if
+        if commandLineArgs.jobs > 0:
+            self.jobs = commandLineArgs.jobs
+        # end if
+        self.batchFile = commandLineArgs.batch
+        self.cacheDir = commandLineArgs.cache
+        self.force = commandLineArgs.force
+        self.check = commandLineArgs.check
+        self.jobFile = commandLineArgs.job
+        self.pdf = commandLineArgs.pdf
+        self.split = commandLineArgs.split
+        self.servePort = commandLineArgs.serve
+        self.profileJsonFile = commandLineArgs.profilejson
+        self.cProfileFile = commandLineArgs.cprofile
+        self.profile = commandLineArgs.profile or self.profileJsonFile is not None or self.cProfileFile is not None
+        for key, value in (('ReportNumber', commandLineArgs.reportnumber),
+                           ('Serial', commandLineArgs.serial),
+                           ('ReceivedDate', commandLineArgs.receiveddate),
+                           ('CalDate', commandLineArgs.caldate),
+                           ('ClientName', commandLineArgs.clientname),
+                           ('ClientAddress1', commandLineArgs.clientaddress1),
+                           ('ClientAddress2', commandLineArgs.clientaddress2),
+                           ('ClientAddress3', commandLineArgs.clientaddress3),
+                           ('CalByName', commandLineArgs.calbyname),
+                           ('CalByTitle', commandLineArgs.calbytitle),
+                           ('ApprovedByName', commandLineArgs.approvedbyname),
+                           ('ApprovedByTitle', commandLineArgs.approvedbytitle)):
+            if value is not None:
+                self.presets[key] = value
+            # end if
+        # end for
         self.verbose = commandLineArgs.verbose
     # end def
 
-    def getSerial(self):
-        self.serialNumber = input('Enter serial number: ')
+    def setSerial(self, serialNumber):
+        self.serialNumber = serialNumber
         if self.serialNumber == '' or self.serialNumber is None:
             raise ValueError('Serial number cannot be empty')
         # end if
+        checkFileNamePart(self.serialNumber, 'Serial number')
 
         # Get device ID from serial number
         tmp = self.serialNumber[self.serialNumber.rindex('.') + 1:]
         self.deviceId = int(tmp)
     # end def
 
-    def getCalDate(self):
-        calDateRaw = input('Enter calibration date (dd/mm/yyyy): ')
-        tmpDate = calDateRaw.split('/')
-        self.calDate = datetime.date(int(tmpDate[2]), int(tmpDate[1]), int(tmpDate[0]))
+    def getValue(self, key, prompt):
+        # Value from the command line or the job file, the user is only asked if neither has it
+        value = self.presets.get(key)
+        if value is None:
+            value = input(prompt)
+        # end if
+        return value
+    # end def
+
+    def getSerial(self):
+        self.setSerial(self.getValue('Serial', 'Enter serial number: '))
+    # end def
+
+    def setCalDate(self, calDateRaw):
+        self.calDate = parseDate(calDateRaw, 'calibration date')
         self.recommendedNextCal = self.calDate + datetime.timedelta(days=365)
     # end def
 
+    def getCalDate(self):
+        self.setCalDate(self.getValue('CalDate', 'Enter calibration date (dd/mm/yyyy): '))
+    # end def
+
+    def setReceivedDate(self, recvDateRaw):
+        self.receivedDate = parseDate(recvDateRaw, 'received date')
+    # end def
+
     def getReceivedDate(self):
-        recvDateRaw = input('Enter received date (dd/mm/yyyy): ')
-        tmpDate = recvDateRaw.split('/')
-        self.receivedDate = datetime.date(int(tmpDate[2]), int(tmpDate[1]), int(tmpDate[0]))
+        self.setReceivedDate(self.getValue('ReceivedDate', 'Enter received date (dd/mm/yyyy): '))
     # end def
 
     def getClientDetails(self):
-        self.clientName = input('Enter client name: ')
-        self.clientAddress1 = input('Enter client address line 1: ')
-        self.clientAddress2 = input('Enter client address line 2: ')
-        self.clientAddress3 = input('Enter client address line 3: ')
+        self.clientName = self.getValue('ClientName', 'Enter client name: ')
+        self.clientAddress1 = self.getValue('ClientAddress1', 'Enter client address line 1: ')
+        self.clientAddress2 = self.getValue('ClientAddress2', 'Enter client address line 2: ')
+        self.clientAddress3 = self.getValue('ClientAddress3', 'Enter client address line 3: ')
     # end def
 
     def getCalStaff(self):
-        self.calByName = input('Enter name of calibration operator: ')
-        self.calByTitle = input('Enter title of calibration operator: ')
-        self.approvedByName = input('Enter name of calibration approver: ')
-        self.approvedByTitle = input('Enter title of calibration approver: ')
+        self.calByName = self.getValue('CalByName', 'Enter name of calibration operator: ')
+        self.calByTitle = self.getValue('CalByTitle', 'Enter title of calibration operator: ')
+        self.approvedByName = self.getValue('ApprovedByName', 'Enter name of calibration approver: ')
+        self.approvedByTitle = self.getValue('ApprovedByTitle', 'Enter title of calibration approver: ')
     # end def
 
     def getCalEquipment(self):
@@ -225,772 +463,3337 @@ class Settings:
         self.calValueMOhmCalibrator = config['Calibrator'].getfloat('Value')
     # end def
 
-    def getReportNumber(self):
-        self.reportNumber = input('Enter report number: ')
-    # end def
+    def getSettingsFromJobFile(self):
+        # Job file has a [Report] section with the same keys as the batch manifest columns
+        # Values given on the command line take precedence
+        config = configparser.ConfigParser(interpolation=None)
+        config.optionxform = str
+        config.read(self.jobFile, encoding='utf-8')
+        if 'Report' not in config:
+            raise ValueError('Section [Report] missing in job file ' + self.jobFile)
+        # end if
 
-    def setOutputFile(self):
-        self.outputFile = os.path.join(os.path.dirname(sys.argv[0]), 'Calibration Report ' + self.serialNumber + ' - Report number ' + self.reportNumber + '.typ')
-        # file = open(settings.output, 'w', encoding='utf-8', newline='')
+        for key in MANIFEST_COLUMNS:
+            if key not in self.presets and key in config['Report']:
+                self.presets[key] = config['Report'][key]
+            # end if
+        # end for
     # end def
 
-# end class
-
-
-class CTS:
-    def __init__(self, settings):
-        self.numChannels = settings.numChannels
-        self.channels = {}
-        self.deviceId = settings.deviceId
-        self.calDate = settings.calDate
-
-        self.calData =  Table(settings.calData, px_encoding='cp1252')
-        self.channelFile =  Table(settings.channelFile, px_encoding='cp1252')
-        self.settings = settings
+    def setReportNumber(self, reportNumber):
+        checkFileNamePart(reportNumber, 'Report number')
+        self.reportNumber = reportNumber
     # end def
 
-    def __del__(self):
-        self.calData.close()
-        self.channelFile.close()
+    def getReportNumber(self):
+        self.setReportNumber(self.getValue('ReportNumber', 'Enter report number: '))
     # end def
 
-    def __str__(self):
-        res = 'Num. channels: ' + str(len(self.channels)) + '\n'
-        if len(self.channels) > 0:
-            for key, value in self.channels.items():
-                res = res + 'Channel: ' + str(key) + '\n' + str(value) + '\n' + '------------------------' + '\n'
-            # end for
+    def fromManifestRow(self, row):
+        self.setReportNumber(row['ReportNumber'])
+        self.setSerial(row['Serial'])
+        self.setReceivedDate(row['ReceivedDate'])
+        self.setCalDate(row['CalDate'])
+        self.clientName = row['ClientName']
+        self.clientAddress1 = row['ClientAddress1']
+        self.clientAddress2 = row['ClientAddress2']
+        self.clientAddress3 = row['ClientAddress3']
+        self.calByName = row['CalByName']
+        self.calByTitle = row['CalByTitle']
+        self.approvedByName = row['ApprovedByName']
+        self.approvedByTitle = row['ApprovedByTitle']
+        if row.get('Channels'):
+            self.numChannels = int(row['Channels'])
         # end if
-        return res
     # end def
 
-    def readChannel(self, channelNumber):
-        # Define channel ID to search for
-        channelId = str(self.deviceId) + ' CH' + ('' if channelNumber > 9 else '0') +  str(channelNumber) + ' CTS'
-        channel = CTSChannel(channelNumber)
-
-        # Determine range based on channel number
-        if channelNumber % 2 == 0:
-            # First channel has a range from 1 to 21
-            rangeFrom = 1
-            rangeTo = 22
-        else:
-            # Second channel has a range from 22 to 42
-            rangeFrom = 22
-            rangeTo = 43
-        # end if
-
-        # Read caldata
-        priorRow = 0
-        for entryNumber in range(rangeFrom, rangeTo):
-            # Trick to speed up search (early abort of record search when both post and pre measurement are found)
-            countFound = 0
-
-            for rowNumber in range(priorRow, len(self.calData)):
-                tableRow = self.calData[rowNumber]
-                if (tableRow['Date'].year == self.calDate.year and tableRow['Date'].month == self.calDate.month and tableRow['Date'].day == self.calDate.day and tableRow['Channel_Id'] == channelId and tableRow['No'] == entryNumber):
-                    # Found either the post- or pre measurement for that range
-                    preMeasurement = False
-                    countFound = countFound + 1
-
-                    # Save number of the row, so search does not have to start from scratch
-                    priorRow = rowNumber
-
-                    # Determine if this is the pre- or post measurement
-                    if tableRow['Range'].startswith('PRE'):
-                        preMeasurement = True
-                    # end if
+    def setOutputFile(self):
+        self.outputFile = os.path.join(os.path.dirname(sys.argv[0]), 'Calibration Report ' + self.serialNumber + ' - Report number ' + self.reportNumber + '.typ')
+        # file = open(settings.output, 'w', encoding='utf-8', newline='')
+    # end def
 
-                    # Store record
-                    channel.addRecord(self.settings, (entryNumber if entryNumber < 22 else entryNumber - 21), preMeasurement, tableRow['Ref_value'], tableRow['Meas_value'], tableRow['Error'], tableRow['Tolerance'])
-                    if abs(tableRow['Error']) > tableRow['Tolerance']:
-                        # Channel out of spec
-                        channel.setOufOfSpec(preMeasurement, (entryNumber if entryNumber < 22 else entryNumber - 21))
-                    # end if
+# end class
 
-                    if countFound == 2:
-                        break
-                    # end if
-                # end if
-            # end for
-        # end for
 
-        # Read channelfile
-        for tableRow in self.channelFile:
-            if tableRow['Id'] == channelId:
-                # Found correct record, save out params
-                i1Factors = {'factor': tableRow['Fak0'], 'offset': tableRow['Off0']}
-                i2Factors = {'factor': tableRow['Fak4'], 'offset': tableRow['Off4']}
-                i3Factors = {'factor': tableRow['Fak5'], 'offset': tableRow['Off5']}
-                i4Factors = {'factor': tableRow['Fak2'], 'offset': tableRow['Off2']}
-                uFactors = {'factor': tableRow['Fak1'], 'offset': tableRow['Off1']}
-                tFactors = {'factor': tableRow['Fak3'], 'offset': tableRow['Off3']}
-                channel.setFactors(i1Factors, i2Factors, i3Factors, i4Factors, uFactors, tFactors)
-        # end for
+def parseDate(dateRaw, name):
+    # Dates are entered as dd/mm/yyyy
+    try:
+        day, month, year = dateRaw.split('/')
+        return datetime.date(int(year), int(month), int(day))
+    except ValueError:
+        raise ValueError('Invalid ' + name + ': ' + dateRaw + ' (expected dd/mm/yyyy)')
+    # end exception
+# end def
 
-        # Save extracted data
-        self.channels[channelNumber] = channel
-    # end def
+def checkFileNamePart(value, name):
+    # Serial number and report number are part of the name of the report file, they must not point to another directory
+    if '/' in value or '\\' in value or '..' in value:
+        raise ValueError(name + ' must not contain /, \\ or ..: ' + value)
+    # end if
+# end def
 
-# end class
 
+def writeSqliteTable(connection, tableName, columns, rows, indexColumns):
+    quotedColumns = ', '.join('"' + column + '"' for column in columns)
+    connection.execute('CREATE TABLE "' + tableName + '" (' + quotedColumns + ')')
+    connection.executemany('INSERT INTO "' + tableName + '" VALUES (' + ', '.join(['?'] * len(columns)) + ')', rows)
+    if indexColumns:
+        connection.execute('CREATE INDEX "' + tableName + '_index" ON "' + tableName + '" (' + ', '.join('"' + column + '"' for column in indexColumns) + ')')
+    # end if
+# end def
 
-class CTSChannel:
-    def __init__(self, channelNumber):
-        self.channelNumber = channelNumber
-        self.records = {}
-        self.factors = {}
-        self.preOutOfSpec = set()
-        self.postOutOfSpec = set()
-    # end def
+def querySqlite(dbFile, tableName, columns, where='', parameters=()):
+    # Rows are returned in the order they were written
+    import sqlite3
+    connection = sqlite3.connect(dbFile)
+    try:
+        cursor = connection.execute('SELECT ' + ', '.join('"' + column + '"' for column in columns) + ' FROM "' + tableName + '"' + (' WHERE ' + where if where else '') + ' ORDER BY rowid', parameters)
+        for row in cursor:
+            yield row
+        # end for
+    finally:
+        connection.close()
+    # end try
+# end def
 
-    def __str__(self):
-        res = ''
-        if len(self.records) > 0:
-            for key, value in self.records.items():
-                res = res + str(key) +  ' -> ' +  str(value) + '\n'
-            # end for
+def querySqliteCalData(dbFile, tableName, calDays, devices, dateRange=None):
+    # Rows of a caldata table written by TableCache or convertData, selected through the (Date, Device) index
+    conditions = []
+    parameters = ()
+    datesByIso = {}
+    if dateRange is not None:
+        # Dates are stored as ISO text, so they compare in date order
+        conditions.append('"Date" BETWEEN ? AND ?')
+        parameters = parameters + (dateRange[0].isoformat(), dateRange[1].isoformat())
+    # end if
+    if calDays is not None:
+        for calDate in calDays.values():
+            datesByIso[calDate.isoformat()] = calDate
+        # end for
+        if len(datesByIso) == 0:
+            return
+        # end if
+        conditions.append('"Date" IN (' + ', '.join(['?'] * len(datesByIso)) + ')')
+        parameters = parameters + tuple(datesByIso.keys())
+    # end if
+    if devices is not None:
+        if len(devices) == 0:
+            return
         # end if
+        conditions.append('"Device" IN (' + ', '.join(['?'] * len(devices)) + ')')
+        parameters = parameters + tuple(devices)
+    # end if
 
-        for key, factor in self.factors:
-            res = res + 'Value: ' + key + ' - Range: ' + factor['range'] + ' - Factor: ' + str(factor['factor']) + ' - Offset: ' + str(factor['offset']) + '\n'
-        # end for
-        if len(self.factors) == 0:
-            res = res + 'No calibration factors found for channel!\n'
+    for row in querySqlite(dbFile, tableName, ('Date',) + CALDATA_COLUMNS[1:], ' AND '.join(conditions), parameters):
+        calDate = datesByIso.get(row[0])
+        if calDate is None:
+            calDate = datetime.date.fromisoformat(row[0])
+            datesByIso[row[0]] = calDate
         # end if
+        yield (calDate,) + row[1:]
+    # end for
+# end def
 
-        res = res + 'Channel out of spec. prior to Calibration: ' + ('YES' if len(self.preOutOfSpec) > 0 else 'NO') + ('(' + str(self.preOutOfSpec) + ')' if len(self.preOutOfSpec) > 0 else '') + '\n'
-        res = res + 'Channel out of spec. post Calibration: ' + ('YES' if len(self.postOutOfSpec) > 0 else 'NO') + ('(' + str(self.postOutOfSpec) + ')' if len(self.postOutOfSpec) > 0 else '') + '\n'
 
-        return res
+class TableCache:
+    # Rows extracted from a Paradox table, stored in a SQLite database in the cache directory
+    # The cache is keyed by the path of the source file and is only valid for the size and mtime it was built from
+    def __init__(self, cacheDir, sourceFile, tableName, columns):
+        import hashlib
+        self.sourceFile = os.path.abspath(sourceFile)
+        self.tableName = tableName
+        self.columns = columns
+        pathHash = hashlib.sha1(self.sourceFile.encode('utf-8')).hexdigest()[:16]
+        self.cacheFile = os.path.join(cacheDir, tableName + '-' + pathHash + '.sqlite')
     # end def
 
-    def setOufOfSpec(self, preMeasurement, entryNumber):
-        # Determine range that is problematic
-        rangeOOS = ''
-        if entryNumber >= 1 and entryNumber <= 4:
-            rangeOOS = '1 mA'
-        elif entryNumber >= 5 and entryNumber <= 8:
-            rangeOOS = '15 mA'
-        elif entryNumber >= 9 and entryNumber <= 12:
-            rangeOOS = '300 mA'
-        elif entryNumber >= 13 and entryNumber <= 16:
-            rangeOOS = '5 A'
-        elif entryNumber >= 17 and entryNumber <= 19:
-            rangeOOS = '6 V'
-        elif entryNumber == 20 or entryNumber == 21:
-            rangeOOS = 'T1'
-        # end if
-
-        if preMeasurement:
-            self.preOutOfSpec.add(rangeOOS)
-        else:
-            self.postOutOfSpec.add(rangeOOS)
+    def sourceSignature(self):
+        fileStat = os.stat(self.sourceFile)
+        return (self.sourceFile, str(fileStat.st_size), str(fileStat.st_mtime_ns))
     # end def
 
-    def getUncertainty(self, settings, rangeValue, preMeasurement, measValue):
-        if preMeasurement:
-            return None
+    def readMeta(self):
+        import sqlite3
+        if not os.path.isfile(self.cacheFile):
+            return {}
         # end if
+        connection = sqlite3.connect(self.cacheFile)
+        try:
+            meta = dict(connection.execute('SELECT key, value FROM meta').fetchall())
+        except sqlite3.Error:
+            meta = {}
+        # end exception
+        connection.close()
+        return meta
+    # end def
 
-        shuntInOhm = settings.calValueMOhmCalibrator / 1000
-        if rangeValue == 1 or rangeValue == 2 or rangeValue == 3 or rangeValue == 4:
-            # I1
-            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
-            uncertComponentShunt = (settings.calUncertaintyCalibrator / 2) * (measValue / settings.calValueMOhmCalibrator)
-            uncertComponentChannel = CTS_RESOLUTION_I1 / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
-            # in [mA]
-        # end if
+    def isValid(self):
+        path, size, mtime = self.sourceSignature()
+        meta = self.readMeta()
+        return meta.get('path') == path and meta.get('size') == size and meta.get('mtime') == mtime
+    # end def
 
-        if rangeValue == 5 or rangeValue == 6 or rangeValue == 7 or rangeValue == 8:
-            # I2
-            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
-            uncertComponentShunt = (settings.calUncertaintyCalibrator / 2) * (measValue / settings.calValueMOhmCalibrator)
-            uncertComponentChannel = CTS_RESOLUTION_I2 / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
-            # in [mA]
+    def rebuild(self, rows, indexColumns, signature=None, extraMeta=None):
+        # Build into a temporary file first, so an interrupted run never leaves a half written cache behind
+        # The signature should be taken before the source is read, so changes made while reading invalidate the cache
+        import sqlite3
+        path, size, mtime = signature if signature is not None else self.sourceSignature()
+        tmpFile = self.cacheFile + '.tmp'
+        if os.path.isfile(tmpFile):
+            os.remove(tmpFile)
         # end if
 
-        if rangeValue == 9 or rangeValue == 12:
-            # I3, +/- 90%
-            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / (2 * 1000)) / shuntInOhm
-            uncertComponentShunt = (settings.calUncertaintyCalibrator / (2 * 1000)) * (measValue / shuntInOhm)
-            uncertComponentChannel = CTS_RESOLUTION_I3 / (sqrt(3) * 1000)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
-            # in [A]
-        # end if
-        if rangeValue == 10 or rangeValue == 11:
-            # I3, +/- 10%
-            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
-            uncertComponentShunt = (settings.calUncertaintyCalibrator / 2) * (measValue / settings.calValueMOhmCalibrator)
-            uncertComponentChannel = CTS_RESOLUTION_I3 / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
-            # in [mA]
-        # end if
+        connection = sqlite3.connect(tmpFile)
+        connection.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)')
+        writeSqliteTable(connection, self.tableName, self.columns, rows, indexColumns)
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', [('path', path), ('size', size), ('mtime', mtime)] + list((extraMeta or {}).items()))
+        connection.commit()
+        connection.close()
+        os.replace(tmpFile, self.cacheFile)
+    # end def
 
-        if rangeValue == 13 or rangeValue == 16:
-            # I4, +/- 90%
-            uncertComponentMultimeter = (settings.calUncertainty1VMultimeter / 2) / shuntInOhm
-            uncertComponentShunt = (settings.calUncertaintyCalibrator / (2 * 1000)) * (measValue / shuntInOhm)
-            uncertComponentChannel = CTS_RESOLUTION_I4 / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
-            # in [A]
-        # end if
-        if rangeValue == 14 or rangeValue == 15:
-            # I4, +/- 10%
-            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / (2 * 1000)) / shuntInOhm
-            uncertComponentShunt = (settings.calUncertaintyCalibrator / (2 * 1000)) * (measValue / shuntInOhm)
-            uncertComponentChannel = CTS_RESOLUTION_I4 / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
-            # in [A]
-        # end if
+    def append(self, rows, signature, extraMeta=None):
+        # Add rows to an existing cache and update its signature in one transaction
+        import sqlite3
+        path, size, mtime = signature
+        connection = sqlite3.connect(self.cacheFile)
+        connection.executemany('INSERT INTO "' + self.tableName + '" VALUES (' + ', '.join(['?'] * len(self.columns)) + ')', rows)
+        connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', [('path', path), ('size', size), ('mtime', mtime)] + list((extraMeta or {}).items()))
+        connection.commit()
+        connection.close()
+    # end def
 
-        if rangeValue == 17:
-            # U, 10%
-            uncertComponentMultimeter = (settings.calUncertainty1VMultimeter / 2)
-            uncertComponentChannel = CTS_RESOLUTION_U / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentChannel * uncertComponentChannel)
-            # in [V]
-        # end if
-        if rangeValue == 18 or rangeValue == 19:
-            # U, 50% and 90%
-            uncertComponentMultimeter = (settings.calUncertainty10VMultimeter / 2)
-            uncertComponentChannel = CTS_RESOLUTION_U / sqrt(3)
-            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentChannel * uncertComponentChannel)
-            # in [V]
-        # end if
+    def query(self, columns, where='', parameters=()):
+        return querySqlite(self.cacheFile, self.tableName, columns, where, parameters)
+    # end def
+# end class
 
-        if rangeValue == 20 or rangeValue == 21:
-            # temperature tbd
-            combinedUncertainty = 0.25
-        # end if
 
-        return combinedUncertainty * 2
+def hashFile(fileName):
+    import hashlib
+    digest = hashlib.sha256()
+    f = open(fileName, 'rb')
+    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+        digest.update(chunk)
+    # end for
+    f.close()
+    return digest.hexdigest()
+# end def
+
+class ResultCache:
+    # Reports written before and their channel array blocks, stored in results.sqlite in the cache directory
+    # A block is keyed by the hash of everything the channel arrays are made of (see channelDataKey) and
+    # holds the arrays together with the out of spec ranges of every channel, which are needed for the report header
+    # A report is keyed by its output file and is current as long as its key and the content of the file are unchanged
+    def __init__(self, cacheDir):
+        import sqlite3
+        os.makedirs(cacheDir, exist_ok=True)
+        self.cacheFile = os.path.join(cacheDir, 'results.sqlite')
+        connection = sqlite3.connect(self.cacheFile)
+        connection.execute('CREATE TABLE IF NOT EXISTS blocks (key TEXT PRIMARY KEY, channels TEXT, arrays TEXT)')
+        connection.execute('CREATE TABLE IF NOT EXISTS reports (outputFile TEXT PRIMARY KEY, key TEXT, contentHash TEXT)')
+        connection.commit()
+        connection.close()
     # end def
 
-    def addRecord(self, settings, rangeValue, preMeasurement, refValue, measValue, error, tolerance):
-        if preMeasurement:
-            rangeValue = rangeValue + 100
+    def getBlock(self, key):
+        # Returns the channels as [channel number, pre out of spec ranges, post out of spec ranges] and the arrays text
+        import sqlite3
+        import json
+        connection = sqlite3.connect(self.cacheFile)
+        row = connection.execute('SELECT channels, arrays FROM blocks WHERE key = ?', (key,)).fetchone()
+        connection.close()
+        if row is None:
+            return None
         # end if
-
-        uncertainty = self.getUncertainty(settings, rangeValue, preMeasurement, refValue)
-        self.records[rangeValue] = CalRecord(refValue, measValue, error, tolerance, uncertainty)
+        return json.loads(row[0]), row[1]
     # end def
 
-    def setFactors(self, i1Factors, i2Factors, i3Factors, i4Factors, uFactors, tFactors):
-        i1Factors['range'] = '±1 mA'
-        i2Factors['range'] = '±15 mA'
-        i3Factors['range'] = '±300 mA'
-        i4Factors['range'] = '±5 A'
-        uFactors['range'] = '0 - 6 V'
-        tFactors['range'] = '-30°C to 100°C'
-
-        self.factors['I1'] = i1Factors
-        self.factors['I2'] = i2Factors
-        self.factors['I3'] = i3Factors
-        self.factors['I4'] = i4Factors
-        self.factors['U'] = uFactors
-        self.factors['T'] = tFactors
+    def putBlock(self, key, channels, arrays):
+        import sqlite3
+        import json
+        connection = sqlite3.connect(self.cacheFile)
+        connection.execute('INSERT OR REPLACE INTO blocks VALUES (?, ?, ?)', (key, json.dumps(channels), arrays))
+        connection.commit()
+        connection.close()
     # end def
-# end class
-
 
-class CalRecord:
-    def __init__(self, refValue, measValue, error, tolerance, uncertainty):
-        self.refValue = refValue if refValue is not None else 0.0
-        self.measValue = measValue if measValue is not None else 0.0
-        self.error = error if error is not None else 0.0
-        self.tolerance = tolerance if tolerance is not None else 0.0
-        self.uncertainty = uncertainty if uncertainty is not None else 0.0
+    def isCurrent(self, outputFile, key):
+        import sqlite3
+        outputFile = os.path.abspath(outputFile)
+        connection = sqlite3.connect(self.cacheFile)
+        row = connection.execute('SELECT key, contentHash FROM reports WHERE outputFile = ?', (outputFile,)).fetchone()
+        connection.close()
+        # The file may have been edited or deleted since it was written
+        return row is not None and row[0] == key and os.path.isfile(outputFile) and hashFile(outputFile) == row[1]
     # end def
 
-    def __str__(self):
-        return 'Ref: ' + str(self.refValue) + ' Meas: ' + str(self.measValue) + ' Error: ' + str(self.error) + ' Tolerance: ' + str(self.tolerance) + ' Uncertainty: ' + str(self.uncertainty)
+    def putReport(self, outputFile, key):
+        import sqlite3
+        outputFile = os.path.abspath(outputFile)
+        connection = sqlite3.connect(self.cacheFile)
+        connection.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?)', (outputFile, key, hashFile(outputFile)))
+        connection.commit()
+        connection.close()
     # end def
 # end class
 
+# Opened result caches by cache directory
+resultCaches = {}
+
+def openResultCache(settings):
+    # Reports are only cached with --cache
+    if settings.cacheDir is None:
+        return None
+    # end if
+    if settings.cacheDir not in resultCaches:
+        resultCaches[settings.cacheDir] = ResultCache(settings.cacheDir)
+    # end if
+    return resultCaches[settings.cacheDir]
+# end def
+
 
 ###############################################################################
-# Settings
+# Direct Paradox reader
+#
+# Paradox .DB layout as read by pxlib (all header values little endian):
+#   0x00 record size, 0x02 header size, 0x04 file type, 0x05 block size / 0x400, 0x06 number of records,
+#   0x0C number of blocks, 0x0E first data block, 0x21 number of fields, 0x25 encryption, 0x39 file version
+#   From version 4.0 the header continues with a data header, its encryption field at 0x5C replaces the one at 0x25
+#   Field types and sizes at 0x78 (0x58 before version 4.0), followed by the table name pointer, one name
+#   pointer per field, the table name (79 bytes, 261 from version 7.0) and the null terminated field names
+#   Data blocks are chained, each starts with next block, previous block and the offset of its last record
+# Field values are big endian with the sign bit flipped, a value of all zero bytes is empty
 ###############################################################################
 
-def readCommandLineArgs():
-    '''
-    Read command line parameters
-    '''
-    parser = argparse.ArgumentParser(description='Read BaSyTec CTS calibration data and create report in typst format - Ver.: ' + VERSION)
-    parser.add_argument('-d',
-                        '--caldata',
-                        required=True,
-                        help='Caldata file [caldata.db]')
-    parser.add_argument('-c',
-                        '--channelfile',
-                        required=True,
-                        help='Channel file [channel.db]')
-    parser.add_argument('-n',
-                        '--numchannels',
-                        required=False,
+def decodeParadoxAlpha(raw):
+    end = raw.find(b'\0')
+    if end == 0:
+        return None
+    # end if
+    return (raw if end < 0 else raw[:end]).decode(PARADOX_VALUE_ENCODING)
+# end def
+
+def decodeParadoxInteger(raw):
+    # Short values, also the day number of dates and the milliseconds of times
+    value = int.from_bytes(raw, 'big')
+    signBit = 1 << (8 * len(raw) - 1)
+    if value & signBit:
+        return value ^ signBit
+    elif value == 0:
+        return None
+    # end if
+    return value - signBit
+# end def
+
+def decodeParadoxLong(raw):
+    # Long and autoincrement values, pypxlib returns empty values as -2147483648
+    value = decodeParadoxInteger(raw)
+    return value if value is not None else -2147483648
+# end def
+
+def decodeParadoxDouble(raw):
+    # Number and currency values, negative values have all bits inverted
+    # Empty values are returned as 0.0, pypxlib does the same
+    value = int.from_bytes(raw, 'big')
+    if value & 0x8000000000000000:
+        value = value ^ 0x8000000000000000
+    elif value == 0:
+        return 0.0
+    else:
+        value = value ^ 0xFFFFFFFFFFFFFFFF
+    # end if
+    return struct.unpack('>d', value.to_bytes(8, 'big'))[0]
+# end def
+
+def decodeParadoxDate(raw):
+    days = decodeParadoxInteger(raw)
+    if days is None or days <= 0:
+        return None
+    # end if
+    return datetime.date.fromordinal(days)
+# end def
+
+def decodeParadoxTime(raw):
+    milliseconds = decodeParadoxInteger(raw)
+    if milliseconds is None:
+        return None
+    # end if
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return datetime.time(hours, minutes, seconds, milliseconds * 1000)
+# end def
+
+def decodeParadoxTimestamp(raw):
+    # Milliseconds since 1/1/0001 minus one day, split into days and time of day like pypxlib does
+    milliseconds = decodeParadoxDouble(raw)
+    if milliseconds < 86400000:
+        return None
+    # end if
+    return datetime.datetime.fromordinal(int(milliseconds / 86400000)) + datetime.timedelta(milliseconds=int(milliseconds % 86400000))
+# end def
+
+def decodeParadoxLogical(raw):
+    value = decodeParadoxInteger(raw)
+    return bool(value) if value is not None else None
+# end def
+
+def paradoxDayNumber(fieldType, raw):
+    # Day number (date ordinal) of a date or timestamp value without creating the date
+    if fieldType == PARADOX_DATE:
+        days = decodeParadoxInteger(raw)
+        return days if days is not None and days > 0 else None
+    # end if
+    milliseconds = decodeParadoxDouble(raw)
+    return int(milliseconds / 86400000) if milliseconds >= 86400000 else None
+# end def
+
+# Decoder of every supported Paradox field type
+PARADOX_DECODERS = {
+    PARADOX_ALPHA: decodeParadoxAlpha,
+    PARADOX_DATE: decodeParadoxDate,
+    PARADOX_SHORT: decodeParadoxInteger,
+    PARADOX_LONG: decodeParadoxLong,
+    PARADOX_CURRENCY: decodeParadoxDouble,
+    PARADOX_NUMBER: decodeParadoxDouble,
+    PARADOX_LOGICAL: decodeParadoxLogical,
+    PARADOX_TIME: decodeParadoxTime,
+    PARADOX_TIMESTAMP: decodeParadoxTimestamp,
+    PARADOX_AUTOINC: decodeParadoxLong,
+}
+
+
+class ParadoxReader:
+    # Records of a Paradox table read straight from the memory mapped file, in the order of the data block chain like pypxlib
+    # Only unencrypted tables of version 3.0 to 7.x are supported, anything else raises ValueError
+    def __init__(self, fileName):
+        import mmap
+        self.fileName = fileName
+        self.file = open(fileName, 'rb')
+        self.buffer = None
+        try:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.readHeader()
+        except (ValueError, IndexError, struct.error, OSError) as error:
+            self.close()
+            raise ValueError('Unsupported Paradox file ' + fileName + ' (' + str(error) + ')')
+        # end exception
+    # end def
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+        # end if
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        # end if
+    # end def
+
+    def readHeader(self):
+        buffer = self.buffer
+        self.recordSize, self.headerSize = struct.unpack_from('<HH', buffer, 0x00)
+        fileType = buffer[0x04]
+        self.blockSize = buffer[0x05] * 0x400
+        self.numRecords = struct.unpack_from('<I', buffer, 0x06)[0]
+        self.numBlocks, self.firstBlock = struct.unpack_from('<HH', buffer, 0x0C)
+        numFields = struct.unpack_from('<H', buffer, 0x21)[0]
+        version = buffer[0x39]
+        encryption = struct.unpack_from('<I', buffer, 0x5C if version >= 5 else 0x25)[0]
+        if version < 3 or version > 0x0C:
+            raise ValueError('file version ' + str(version))
+        if fileType not in (0, 2):
+            raise ValueError('not a data table')
+        if self.recordSize == 0 or self.blockSize == 0 or self.headerSize + self.numBlocks * self.blockSize > len(buffer):
+            raise ValueError('invalid header')
+        if encryption != 0 and encryption != 0xFF00FF00:
+            raise ValueError('encrypted')
+        # end if
+
+        position = 0x78 if version >= 5 else 0x58
+        fieldTypes = []
+        for fieldNumber in range(0, numFields):
+            fieldTypes.append((buffer[position], buffer[position + 1]))
+            position = position + 2
+        # end for
+        position = position + 4 + 4 * numFields + (261 if version >= 0x0C else 79)
+
+        # Field name -> (offset in record, type, size)
+        self.fields = {}
+        offset = 0
+        for fieldType, fieldSize in fieldTypes:
+            end = buffer.find(b'\0', position)
+            if end < 0:
+                raise ValueError('invalid field names')
+            # end if
+            self.fields[buffer[position:end].decode('cp1252')] = (offset, fieldType, fieldSize)
+            position = end + 1
+            offset = offset + fieldSize
+        # end for
+        if offset != self.recordSize:
+            raise ValueError('field sizes do not match the record size')
+        # end if
+    # end def
+
+    def field(self, name):
+        # (offset in record, size, decoder) of a field
+        if name not in self.fields:
+            raise ValueError('field ' + name + ' not found in ' + self.fileName)
+        # end if
+        offset, fieldType, fieldSize = self.fields[name]
+        if fieldType not in PARADOX_DECODERS:
+            raise ValueError('type ' + str(fieldType) + ' of field ' + name + ' is not supported')
+        # end if
+        return offset, fieldSize, PARADOX_DECODERS[fieldType]
+    # end def
+
+    def records(self, firstRow=0, lastRow=None):
+        # Offsets of the records firstRow to lastRow - 1, blocks in front of firstRow are skipped without reading their records
+        lastRow = self.numRecords if lastRow is None else lastRow
+        rowNumber = 0
+        blockNumber = self.firstBlock
+        numBlocks = 0
+        while blockNumber > 0 and rowNumber < lastRow:
+            numBlocks = numBlocks + 1
+            blockOffset = self.headerSize + (blockNumber - 1) * self.blockSize
+            if numBlocks > self.numBlocks or blockOffset + 6 > len(self.buffer):
+                raise ValueError('Invalid data block chain in ' + self.fileName)
+            # end if
+            nextBlock, previousBlock, lastRecordOffset = struct.unpack_from('<HHh', self.buffer, blockOffset)
+            numBlockRecords = lastRecordOffset // self.recordSize + 1
+            if rowNumber + numBlockRecords > firstRow:
+                for blockRecord in range(max(0, firstRow - rowNumber), min(numBlockRecords, lastRow - rowNumber)):
+                    yield blockOffset + 6 + blockRecord * self.recordSize
+                # end for
+            # end if
+            rowNumber = rowNumber + numBlockRecords
+            blockNumber = nextBlock
+        # end while
+    # end def
+
+    def record(self, rowNumber, names):
+        # Decoded values of the given fields of one record
+        for recordOffset in self.records(rowNumber, rowNumber + 1):
+            values = []
+            for name in names:
+                offset, size, decode = self.field(name)
+                values.append(decode(self.buffer[recordOffset + offset:recordOffset + offset + size]))
+            # end for
+            return tuple(values)
+        # end for
+        raise IndexError(rowNumber)
+    # end def
+# end class
+
+
+###############################################################################
+# Storage backends
+#
+# A backend gives access to the rows of caldata.DB and channel.DB, wherever they are stored:
+#   streamCalData(calDays, devices, dateRange=None)
+#                                     rows (date, Channel_Id, No, Range, Ref_value, Meas_value, Error, Tolerance)
+#                                     of the given days {(year, month, day): date} and device IDs (strings)
+#                                     and between the dates (first, last) of dateRange,
+#                                     None selects all, rows are returned in the order of caldata.DB
+#   readChannelFactors(channelIds)    rows (Id,) + CHANNEL_FACTOR_COLUMNS of the given channel IDs, None selects all
+#   close()                           release open files
+#   hasIndex                          True if selecting a date and device does not need a scan of all rows
+#   rowsDecoded                       rows of caldata read so far (see Profiler)
+###############################################################################
+
+class ParadoxBackend:
+    def __init__(self, calDataFile, channelFile, cacheDir=None, direct=False):
+        # Paradox tables are only opened when they have to be read (no cache or cache out of date)
+        # With direct set, caldata.DB is read with ParadoxReader instead of pypxlib if the file is supported
+        self.calDataFile = calDataFile
+        self.channelFileName = channelFile
+        self.direct = direct
+        self.calData = None
+        self.calDataReader = None
+        self.channelFile = None
+        self.calDataCache = None
+        self.channelCache = None
+        if cacheDir is not None:
+            os.makedirs(cacheDir, exist_ok=True)
+            self.calDataCache = TableCache(cacheDir, calDataFile, 'caldata', ('Date', 'Device') + CALDATA_COLUMNS[1:])
+            self.channelCache = TableCache(cacheDir, channelFile, 'channel', ('Id',) + CHANNEL_FACTOR_COLUMNS)
+        # end if
+        self.hasIndex = self.calDataCache is not None
+        self.rowsDecoded = 0
+    # end def
+
+    def __del__(self):
+        self.close()
+    # end def
+
+    def close(self):
+        if self.calData is not None:
+            self.calData.close()
+            self.calData = None
+        # end if
+        if self.calDataReader is not None:
+            self.calDataReader.close()
+            self.calDataReader = None
+        # end if
+        if self.channelFile is not None:
+            self.channelFile.close()
+            self.channelFile = None
+        # end if
+    # end def
+
+    def openCalData(self):
+        if self.calData is None:
+            start = time.perf_counter()
+            self.calData =  Table(self.calDataFile, px_encoding='cp1252')
+            profiler.addStage('open caldata.DB', time.perf_counter() - start)
+        # end if
+        return self.calData
+    # end def
+
+    def openCalDataReader(self):
+        # Direct reader of caldata.DB, None if not enabled or the file is not supported
+        if self.direct and self.calDataReader is None:
+            start = time.perf_counter()
+            reader = None
+            try:
+                reader = ParadoxReader(self.calDataFile)
+                for column in CALDATA_COLUMNS:
+                    reader.field(column)
+                # end for
+                if reader.fields['Date'][1] not in (PARADOX_DATE, PARADOX_TIMESTAMP):
+                    raise ValueError('Date field of ' + self.calDataFile + ' is neither a date nor a timestamp')
+                # end if
+                self.calDataReader = reader
+            except ValueError as error:
+                if reader is not None:
+                    reader.close()
+                # end if
+                colored_print(Fore.RED + '\nWARNING: ' + str(error) + ', reading caldata.DB with pypxlib')
+                self.direct = False
+            # end exception
+            profiler.addStage('open caldata.DB', time.perf_counter() - start)
+        # end if
+        return self.calDataReader
+    # end def
+
+    def numCalDataRecords(self):
+        reader = self.openCalDataReader()
+        return reader.numRecords if reader is not None else len(self.openCalData())
+    # end def
+
+    def openChannelFile(self):
+        if self.channelFile is None:
+            start = time.perf_counter()
+            self.channelFile =  Table(self.channelFileName, px_encoding='cp1252')
+            profiler.addStage('open channel.DB', time.perf_counter() - start)
+        # end if
+        return self.channelFile
+    # end def
+
+    def readCalDataRows(self, firstRow, lastRow):
+        # Decode the rows firstRow to lastRow - 1 of caldata.DB for the cache (Date is stored as ISO date, Device is the device ID part of Channel_Id)
+        reader = self.openCalDataReader()
+        if reader is not None:
+            for row in self.streamDirectCalData(reader, None, None, firstRow, lastRow):
+                yield (row[0].isoformat(), row[1].split(' CH', 1)[0]) + row[1:]
+            # end for
+            return
+        # end if
+
+        calData = self.openCalData()
+        start = time.perf_counter()
+        for rowNumber in range(firstRow, lastRow):
+            if profiler.enabled and (rowNumber - firstRow) % PROFILE_PROGRESS_ROWS == 0:
+                self.showReadProgress(rowNumber - firstRow, lastRow - firstRow, start, False)
+            # end if
+            self.rowsDecoded = self.rowsDecoded + 1
+            tableRow = calData[rowNumber]
+            rowDate = tableRow['Date']
+            channelId = tableRow['Channel_Id']
+            if rowDate is None or channelId is None:
+                continue
+            # end if
+            yield (datetime.date(rowDate.year, rowDate.month, rowDate.day).isoformat(), channelId.split(' CH', 1)[0], channelId) + tuple(tableRow[column] for column in CALDATA_COLUMNS[2:])
+        # end for
+        if profiler.enabled:
+            self.showReadProgress(lastRow - firstRow, lastRow - firstRow, start, True)
+        # end if
+    # end def
+
+    def showReadProgress(self, rowsRead, numRows, start, reset):
+        # Live read rate of caldata.DB, only shown with --profile
+        seconds = time.perf_counter() - start
+        printProgressBar(int(rowsRead * 100 / numRows) if numRows > 0 else 100, 'Reading caldata.DB...', reset, rowsRead / seconds if rowsRead > 0 and seconds > 0 else None)
+    # end def
+
+    def streamCalData(self, calDays, devices, dateRange=None):
+        # Date and Channel_Id are decoded first, all other columns only for rows that match
+        if self.calDataCache is not None:
+            yield from self.streamCachedCalData(calDays, devices, dateRange)
+            return
+        # end if
+        reader = self.openCalDataReader()
+        if reader is not None:
+            yield from self.streamDirectCalData(reader, calDays, devices, dateRange=dateRange)
+            return
+        # end if
+
+        calData = self.openCalData()
+        numRows = len(calData) if profiler.enabled else 0
+        start = time.perf_counter()
+        rowsDecoded = 0
+        for tableRow in calData:
+            if profiler.enabled and rowsDecoded % PROFILE_PROGRESS_ROWS == 0:
+                self.showReadProgress(rowsDecoded, numRows, start, False)
+            # end if
+            rowsDecoded = rowsDecoded + 1
+            rowDate = tableRow['Date']
+            if rowDate is None:
+                continue
+            # end if
+            if calDays is not None:
+                calDate = calDays.get((rowDate.year, rowDate.month, rowDate.day))
+                if calDate is None:
+                    continue
+                # end if
+            else:
+                calDate = datetime.date(rowDate.year, rowDate.month, rowDate.day)
+            # end if
+            if dateRange is not None and (calDate < dateRange[0] or calDate > dateRange[1]):
+                continue
+            # end if
+
+            channelId = tableRow['Channel_Id']
+            if channelId is None or (devices is not None and channelId.split(' CH', 1)[0] not in devices):
+                continue
+            # end if
+
+            yield (calDate, channelId) + tuple(tableRow[column] for column in CALDATA_COLUMNS[2:])
+        # end for
+        self.rowsDecoded = self.rowsDecoded + rowsDecoded
+        if profiler.enabled:
+            self.showReadProgress(rowsDecoded, numRows, start, True)
+        # end if
+    # end def
+
+    def streamDirectCalData(self, reader, calDays, devices, firstRow=0, lastRow=None, dateRange=None):
+        # Same rows as streamCalData, Date and Channel_Id are checked on the raw bytes of the record
+        # and the other columns are only decoded for rows that match
+        buffer = reader.buffer
+        dateType = reader.fields['Date'][1]
+        dateOffset, dateSize, decodeDate = reader.field('Date')
+        idOffset, idSize, decodeId = reader.field('Channel_Id')
+        valueFields = [reader.field(column) for column in CALDATA_COLUMNS[2:]]
+
+        # Day number -> calibration date (None if not selected), raw Channel_Id -> channel ID (None if the device is not selected)
+        dates = {}
+        channelIds = {}
+        lastRow = reader.numRecords if lastRow is None else lastRow
+        start = time.perf_counter()
+        rowsDecoded = 0
+        for recordOffset in reader.records(firstRow, lastRow):
+            if profiler.enabled and rowsDecoded % PROFILE_PROGRESS_ROWS == 0:
+                self.showReadProgress(rowsDecoded, lastRow - firstRow, start, False)
+            # end if
+            rowsDecoded = rowsDecoded + 1
+
+            dayNumber = paradoxDayNumber(dateType, buffer[recordOffset + dateOffset:recordOffset + dateOffset + dateSize])
+            if dayNumber is None:
+                continue
+            # end if
+            if dayNumber in dates:
+                calDate = dates[dayNumber]
+            else:
+                calDate = datetime.date.fromordinal(dayNumber)
+                if calDays is not None:
+                    calDate = calDays.get((calDate.year, calDate.month, calDate.day))
+                # end if
+                if calDate is not None and dateRange is not None and (calDate < dateRange[0] or calDate > dateRange[1]):
+                    calDate = None
+                # end if
+                dates[dayNumber] = calDate
+            # end if
+            if calDate is None:
+                continue
+            # end if
+
+            rawId = buffer[recordOffset + idOffset:recordOffset + idOffset + idSize]
+            if rawId in channelIds:
+                channelId = channelIds[rawId]
+            else:
+                channelId = decodeId(rawId)
+                if channelId is not None and devices is not None and channelId.split(' CH', 1)[0] not in devices:
+                    channelId = None
+                # end if
+                channelIds[rawId] = channelId
+            # end if
+            if channelId is None:
+                continue
+            # end if
+
+            yield (calDate, channelId) + tuple(decode(buffer[recordOffset + offset:recordOffset + offset + size]) for offset, size, decode in valueFields)
+        # end for
+        self.rowsDecoded = self.rowsDecoded + rowsDecoded
+        if profiler.enabled:
+            self.showReadProgress(rowsDecoded, lastRow - firstRow, start, True)
+        # end if
+    # end def
+
+    def calDataRowSignature(self, rowNumber):
+        # Identifies a record of caldata.DB, used to verify that the cached part of the file was not modified
+        reader = self.openCalDataReader()
+        if reader is not None:
+            return repr(reader.record(rowNumber, CALDATA_COLUMNS))
+        # end if
+        tableRow = self.openCalData()[rowNumber]
+        return repr(tuple(tableRow[column] for column in CALDATA_COLUMNS))
+    # end def
+
+    def updateCalDataCache(self):
+        # The Basytec software only appends to caldata.DB, so only the records added since the last run are decoded
+        # If the file shrank or the last cached record changed, the cache is rebuilt from scratch
+        cache = self.calDataCache
+        if cache.isValid():
+            return
+        # end if
+        start = time.perf_counter()
+        rowsDecoded = self.rowsDecoded
+
+        # Reopen the table, it may have grown since it was opened
+        signature = cache.sourceSignature()
+        if self.calData is not None:
+            self.calData.close()
+            self.calData = None
+        # end if
+        if self.calDataReader is not None:
+            self.calDataReader.close()
+            self.calDataReader = None
+        # end if
+        numRecords = self.numCalDataRecords()
+        extraMeta = {'records': str(numRecords), 'lastRow': self.calDataRowSignature(numRecords - 1) if numRecords > 0 else ''}
+
+        meta = cache.readMeta()
+        cachedRecords = int(meta.get('records', '0'))
+        if meta.get('path') == signature[0] and cachedRecords > 0 and cachedRecords <= numRecords and meta.get('lastRow') == self.calDataRowSignature(cachedRecords - 1):
+            cache.append(self.readCalDataRows(cachedRecords, numRecords), signature, extraMeta)
+        else:
+            cache.rebuild(self.readCalDataRows(0, numRecords), ('Date', 'Device'), signature, extraMeta)
+        # end if
+        profiler.addStage('update caldata cache', time.perf_counter() - start, self.rowsDecoded - rowsDecoded)
+    # end def
+
+    def streamCachedCalData(self, calDays, devices, dateRange):
+        self.updateCalDataCache()
+
+        for row in querySqliteCalData(self.calDataCache.cacheFile, self.calDataCache.tableName, calDays, devices, dateRange):
+            self.rowsDecoded = self.rowsDecoded + 1
+            yield row
+        # end for
+    # end def
+
+    def readAllChannelFactors(self):
+        for tableRow in self.openChannelFile():
+            yield (tableRow['Id'],) + tuple(tableRow[column] for column in CHANNEL_FACTOR_COLUMNS)
+        # end for
+    # end def
+
+    def readChannelFactors(self, channelIds):
+        if self.channelCache is not None:
+            if not self.channelCache.isValid():
+                self.channelCache.rebuild(self.readAllChannelFactors(), None)
+            # end if
+            rows = self.channelCache.query(('Id',) + CHANNEL_FACTOR_COLUMNS)
+        else:
+            rows = self.readAllChannelFactors()
+        # end if
+
+        for row in rows:
+            if channelIds is None or row[0] in channelIds:
+                yield row
+            # end if
+        # end for
+    # end def
+# end class
+
+
+class SQLiteBackend:
+    # Both tables in one SQLite database written by convertData, caldata is indexed by (Date, Device)
+    def __init__(self, dbFile):
+        self.dbFile = dbFile
+        self.hasIndex = True
+        self.rowsDecoded = 0
+    # end def
+
+    def close(self):
+        pass
+    # end def
+
+    def streamCalData(self, calDays, devices, dateRange=None):
+        for row in querySqliteCalData(self.dbFile, 'caldata', calDays, devices, dateRange):
+            self.rowsDecoded = self.rowsDecoded + 1
+            yield row
+        # end for
+    # end def
+
+    def readChannelFactors(self, channelIds):
+        if channelIds is None:
+            return querySqlite(self.dbFile, 'channel', ('Id',) + CHANNEL_FACTOR_COLUMNS)
+        # end if
+        channelIds = tuple(channelIds)
+        return querySqlite(self.dbFile, 'channel', ('Id',) + CHANNEL_FACTOR_COLUMNS, '"Id" IN (' + ', '.join(['?'] * len(channelIds)) + ')', channelIds)
+    # end def
+# end class
+
+
+class ParquetBackend:
+    # Directory with caldata.parquet and channel.parquet written by convertData
+    # Only the row groups and columns needed are read, the rows are filtered by pyarrow
+    def __init__(self, directory):
+        if importPyarrow() is None:
+            raise ValueError('Parquet data needs the pyarrow package')
+        # end if
+        self.calDataFile = os.path.join(directory, 'caldata.parquet')
+        self.channelFile = os.path.join(directory, 'channel.parquet')
+        self.hasIndex = True
+        self.rowsDecoded = 0
+    # end def
+
+    def close(self):
+        pass
+    # end def
+
+    def streamCalData(self, calDays, devices, dateRange=None):
+        filters = []
+        datesByIso = {}
+        if dateRange is not None:
+            # Dates are stored as ISO text, so they compare in date order
+            filters.append(('Date', '>=', dateRange[0].isoformat()))
+            filters.append(('Date', '<=', dateRange[1].isoformat()))
+        # end if
+        if calDays is not None:
+            for calDate in calDays.values():
+                datesByIso[calDate.isoformat()] = calDate
+            # end for
+            if len(datesByIso) == 0:
+                return
+            # end if
+            filters.append(('Date', 'in', list(datesByIso.keys())))
+        # end if
+        if devices is not None:
+            if len(devices) == 0:
+                return
+            # end if
+            filters.append(('Device', 'in', list(devices)))
+        # end if
+
+        columns = ('Date',) + CALDATA_COLUMNS[1:]
+        table = importPyarrow().parquet.read_table(self.calDataFile, columns=list(columns), filters=filters if len(filters) > 0 else None)
+        for row in zip(*[table.column(column).to_pylist() for column in columns]):
+            self.rowsDecoded = self.rowsDecoded + 1
+            calDate = datesByIso.get(row[0])
+            if calDate is None:
+                calDate = datetime.date.fromisoformat(row[0])
+                datesByIso[row[0]] = calDate
+            # end if
+            yield (calDate,) + row[1:]
+        # end for
+    # end def
+
+    def readChannelFactors(self, channelIds):
+        columns = ('Id',) + CHANNEL_FACTOR_COLUMNS
+        table = importPyarrow().parquet.read_table(self.channelFile, columns=list(columns), filters=[('Id', 'in', list(channelIds))] if channelIds is not None else None)
+        return zip(*[table.column(column).to_pylist() for column in columns])
+    # end def
+# end class
+
+
+def openDataBackend(settings):
+    '''
+    Backend for the data given on the command line: Paradox files (-d, -c), or a database written by --convert (--source)
+    '''
+    if settings.dataSource is None:
+        return ParadoxBackend(settings.calData, settings.channelFile, settings.cacheDir, settings.direct)
+    elif os.path.isdir(settings.dataSource):
+        return ParquetBackend(settings.dataSource)
+    # end if
+    return SQLiteBackend(settings.dataSource)
+# end def
+
+
+class CalDataSource:
+    def __init__(self, backend):
+        self.backend = backend
+        self.calDataIndex = None
+        self.channelFactors = None
+    # end def
+
+    def streamCalData(self, calDates, deviceIds, dateRange=None):
+        # Stream the rows of caldata that belong to one of the given calibration dates and devices
+        # calDates or deviceIds set to None selects all dates or all devices, dateRange (first, last) limits the dates
+        calDays = None
+        if calDates is not None:
+            calDays = {}
+            for calDate in calDates:
+                calDays[(calDate.year, calDate.month, calDate.day)] = calDate
+            # end for
+        # end if
+        devices = set(str(deviceId) for deviceId in deviceIds) if deviceIds is not None else None
+
+        return self.backend.streamCalData(calDays, devices, dateRange)
+    # end def
+
+    def indexCalData(self, calDates, deviceIds):
+        # Read the rows of the calibration dates and devices from caldata in a single pass and
+        # index every measurement by (date, channel ID, entry number, pre-measurement)
+        # Only the first row found for each key is kept
+        start = time.perf_counter()
+        rowsDecoded = self.backend.rowsDecoded
+        rowsMatched = 0
+        self.calDataIndex = {}
+        for rowDate, channelId, entryNumber, rangeName, refValue, measValue, error, tolerance in self.streamCalData(calDates, deviceIds):
+            rowsMatched = rowsMatched + 1
+            key = (rowDate, channelId, entryNumber, rangeName.startswith('PRE'))
+            if key not in self.calDataIndex:
+                self.calDataIndex[key] = (refValue, measValue, error, tolerance)
+            # end if
+        # end for
+        profiler.addStage('index caldata.DB', time.perf_counter() - start, self.backend.rowsDecoded - rowsDecoded, rowsMatched)
+    # end def
+
+    def indexChannelFile(self, channelIds=None):
+        # Index the calibration factors by channel ID, channelIds set to None reads all channels
+        # If a channel ID appears more than once, the last row wins
+        start = time.perf_counter()
+        self.channelFactors = {}
+        numRows = 0
+        for row in self.backend.readChannelFactors(channelIds):
+            numRows = numRows + 1
+            self.channelFactors[row[0]] = dict(zip(CHANNEL_FACTOR_COLUMNS, row[1:]))
+        # end for
+        profiler.addStage('index channel.DB', time.perf_counter() - start, numRows, numRows)
+    # end def
+
+# end class
+
+
+class CTS:
+    def __init__(self, settings, source=None):
+        self.numChannels = settings.numChannels
+        self.channels = {}
+        self.deviceId = settings.deviceId
+        self.calDate = settings.calDate
+
+        # The data source can be shared by several reports (batch mode)
+        self.source = source if source is not None else CalDataSource(openDataBackend(settings))
+        self.settings = settings
+
+        # Set when the result cache is used: hash of the channel data and the arrays taken from the cache
+        self.dataKey = None
+        self.channelArrays = None
+        self.cachedBlock = False
+    # end def
+
+    def __str__(self):
+        res = 'Num. channels: ' + str(len(self.channels)) + '\n'
+        if len(self.channels) > 0:
+            for key, value in self.channels.items():
+                res = res + 'Channel: ' + str(key) + '\n' + str(value) + '\n' + '------------------------' + '\n'
+            # end for
+        # end if
+        return res
+    # end def
+
+    def readChannel(self, channelNumber):
+        # Indexes are built on first use and shared by all channels
+        if self.source.calDataIndex is None:
+            self.source.indexCalData([self.calDate], [self.deviceId])
+        # end if
+        if self.source.channelFactors is None:
+            self.source.indexChannelFile()
+        # end if
+
+        # Save extracted data
+        start = time.perf_counter()
+        self.channels[channelNumber] = extractChannel(self.settings, channelNumber, self.source.calDataIndex, self.source.channelFactors)
+        profiler.addChannel(channelNumber, time.perf_counter() - start, len(self.channels[channelNumber].records))
+    # end def
+
+    def keepOutOfSpec(self, channelNumber, preOutOfSpec, postOutOfSpec):
+        # Channel whose array is already written or cached only carries its out of spec ranges, the rest of the report does not need its records
+        channel = CTSChannel(channelNumber)
+        channel.preOutOfSpec.update(preOutOfSpec)
+        channel.postOutOfSpec.update(postOutOfSpec)
+        self.channels[channelNumber] = channel
+    # end def
+
+    def restoreChannels(self, channels, channelArrays):
+        for channelNumber, preOutOfSpec, postOutOfSpec in channels:
+            self.keepOutOfSpec(channelNumber, preOutOfSpec, postOutOfSpec)
+        # end for
+        self.channelArrays = channelArrays
+        self.cachedBlock = True
+    # end def
+
+# end class
+
+
+class CTSChannel:
+    def __init__(self, channelNumber):
+        self.channelNumber = channelNumber
+        self.records = ChannelRecords()
+        self.factors = {}
+        self.preOutOfSpec = set()
+        self.postOutOfSpec = set()
+    # end def
+
+    def __str__(self):
+        res = ''
+        if len(self.records) > 0:
+            for key, value in self.records.items():
+                res = res + str(key) +  ' -> ' +  str(value) + '\n'
+            # end for
+        # end if
+
+        for key, factor in self.factors:
+            res = res + 'Value: ' + key + ' - Range: ' + factor['range'] + ' - Factor: ' + str(factor['factor']) + ' - Offset: ' + str(factor['offset']) + '\n'
+        # end for
+        if len(self.factors) == 0:
+            res = res + 'No calibration factors found for channel!\n'
+        # end if
+
+        res = res + 'Channel out of spec. prior to Calibration: ' + ('YES' if len(self.preOutOfSpec) > 0 else 'NO') + ('(' + str(self.preOutOfSpec) + ')' if len(self.preOutOfSpec) > 0 else '') + '\n'
+        res = res + 'Channel out of spec. post Calibration: ' + ('YES' if len(self.postOutOfSpec) > 0 else 'NO') + ('(' + str(self.postOutOfSpec) + ')' if len(self.postOutOfSpec) > 0 else '') + '\n'
+
+        return res
+    # end def
+
+    def setOufOfSpec(self, preMeasurement, entryNumber):
+        # Determine range that is problematic
+        rangeOOS = rangeOfEntry(entryNumber)
+
+        if preMeasurement:
+            self.preOutOfSpec.add(rangeOOS)
+        else:
+            self.postOutOfSpec.add(rangeOOS)
+    # end def
+
+    def getUncertainty(self, settings, rangeValue, preMeasurement, measValue):
+        if preMeasurement:
+            return None
+        # end if
+
+        shuntInOhm = settings.calValueMOhmCalibrator / 1000
+        if rangeValue == 1 or rangeValue == 2 or rangeValue == 3 or rangeValue == 4:
+            # I1
+            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
+            uncertComponentShunt = (settings.calUncertaintyCalibrator / 2) * (measValue / settings.calValueMOhmCalibrator)
+            uncertComponentChannel = CTS_RESOLUTION_I1 / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
+            # in [mA]
+        # end if
+
+        if rangeValue == 5 or rangeValue == 6 or rangeValue == 7 or rangeValue == 8:
+            # I2
+            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
+            uncertComponentShunt = (settings.calUncertaintyCalibrator / 2) * (measValue / settings.calValueMOhmCalibrator)
+            uncertComponentChannel = CTS_RESOLUTION_I2 / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
+            # in [mA]
+        # end if
+
+        if rangeValue == 9 or rangeValue == 12:
+            # I3, +/- 90%
+            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / (2 * 1000)) / shuntInOhm
+            uncertComponentShunt = (settings.calUncertaintyCalibrator / (2 * 1000)) * (measValue / shuntInOhm)
+            uncertComponentChannel = CTS_RESOLUTION_I3 / (sqrt(3) * 1000)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
+            # in [A]
+        # end if
+        if rangeValue == 10 or rangeValue == 11:
+            # I3, +/- 10%
+            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
+            uncertComponentShunt = (settings.calUncertaintyCalibrator / 2) * (measValue / settings.calValueMOhmCalibrator)
+            uncertComponentChannel = CTS_RESOLUTION_I3 / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
+            # in [mA]
+        # end if
+
+        if rangeValue == 13 or rangeValue == 16:
+            # I4, +/- 90%
+            uncertComponentMultimeter = (settings.calUncertainty1VMultimeter / 2) / shuntInOhm
+            uncertComponentShunt = (settings.calUncertaintyCalibrator / (2 * 1000)) * (measValue / shuntInOhm)
+            uncertComponentChannel = CTS_RESOLUTION_I4 / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
+            # in [A]
+        # end if
+        if rangeValue == 14 or rangeValue == 15:
+            # I4, +/- 10%
+            uncertComponentMultimeter = (settings.calUncertainty100mVMultimeter / (2 * 1000)) / shuntInOhm
+            uncertComponentShunt = (settings.calUncertaintyCalibrator / (2 * 1000)) * (measValue / shuntInOhm)
+            uncertComponentChannel = CTS_RESOLUTION_I4 / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentShunt * uncertComponentShunt + uncertComponentChannel * uncertComponentChannel)
+            # in [A]
+        # end if
+
+        if rangeValue == 17:
+            # U, 10%
+            uncertComponentMultimeter = (settings.calUncertainty1VMultimeter / 2)
+            uncertComponentChannel = CTS_RESOLUTION_U / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentChannel * uncertComponentChannel)
+            # in [V]
+        # end if
+        if rangeValue == 18 or rangeValue == 19:
+            # U, 50% and 90%
+            uncertComponentMultimeter = (settings.calUncertainty10VMultimeter / 2)
+            uncertComponentChannel = CTS_RESOLUTION_U / sqrt(3)
+            combinedUncertainty = sqrt(uncertComponentMultimeter * uncertComponentMultimeter + uncertComponentChannel * uncertComponentChannel)
+            # in [V]
+        # end if
+
+        if rangeValue == 20 or rangeValue == 21:
+            # temperature tbd
+            combinedUncertainty = 0.25
+        # end if
+
+        return combinedUncertainty * 2
+    # end def
+
+    def addRecord(self, rangeValue, preMeasurement, refValue, measValue, error, tolerance):
+        if preMeasurement:
+            rangeValue = rangeValue + 100
+        # end if
+
+        # Uncertainty of post measurements is filled in for all channels at once by UncertaintyEngine
+        self.records.add(rangeValue, refValue, measValue, error, tolerance, None)
+    # end def
+
+    def setFactors(self, i1Factors, i2Factors, i3Factors, i4Factors, uFactors, tFactors):
+        i1Factors['range'] = '±1 mA'
+        i2Factors['range'] = '±15 mA'
+        i3Factors['range'] = '±300 mA'
+        i4Factors['range'] = '±5 A'
+        uFactors['range'] = '0 - 6 V'
+        tFactors['range'] = '-30°C to 100°C'
+
+        self.factors['I1'] = i1Factors
+        self.factors['I2'] = i2Factors
+        self.factors['I3'] = i3Factors
+        self.factors['I4'] = i4Factors
+        self.factors['U'] = uFactors
+        self.factors['T'] = tFactors
+    # end def
+# end class
+
+
+def rangeOfEntry(entryNumber):
+    # Range measured by an entry (1 - 21) of a channel
+    if entryNumber >= 1 and entryNumber <= 4:
+        return '1 mA'
+    elif entryNumber >= 5 and entryNumber <= 8:
+        return '15 mA'
+    elif entryNumber >= 9 and entryNumber <= 12:
+        return '300 mA'
+    elif entryNumber >= 13 and entryNumber <= 16:
+        return '5 A'
+    elif entryNumber >= 17 and entryNumber <= 19:
+        return '6 V'
+    elif entryNumber == 20 or entryNumber == 21:
+        return 'T1'
+    # end if
+    return ''
+# end def
+
+def sortRanges(ranges):
+    # Ranges in entry order, the out of spec ranges of a channel are kept in a set
+    rangeOrder = [rangeOfEntry(entryNumber) for entryNumber in range(1, 22)]
+    return sorted(ranges, key=rangeOrder.index)
+# end def
+
+def recordSlot(rangeValue):
+    # Position of a record key (1 - 21 post, 101 - 121 pre measurement) in ChannelRecords
+    if rangeValue >= 1 and rangeValue <= 21:
+        return rangeValue - 1
+    elif rangeValue >= 101 and rangeValue <= 121:
+        return rangeValue - 80
+    # end if
+    raise KeyError(rangeValue)
+# end def
+
+
+class ChannelRecords(Mapping):
+    # Columnar storage of the records of one channel
+    # Slot 0 - 20: post measurement of entry 1 - 21 (key 1 - 21)
+    # Slot 21 - 41: pre measurement of entry 1 - 21 (key 101 - 121)
+    # Every slot holds RECORD_FIELDS values, records are read through CalRecord views
+    __slots__ = ('values', 'present')
+
+    def __init__(self):
+        self.values = array('d', bytes(8 * 42 * len(RECORD_FIELDS)))
+        self.present = bytearray(42)
+    # end def
+
+    def add(self, rangeValue, refValue, measValue, error, tolerance, uncertainty):
+        slot = recordSlot(rangeValue)
+        offset = slot * len(RECORD_FIELDS)
+        self.values[offset] = refValue if refValue is not None else 0.0
+        self.values[offset + 1] = measValue if measValue is not None else 0.0
+        self.values[offset + 2] = error if error is not None else 0.0
+        self.values[offset + 3] = tolerance if tolerance is not None else 0.0
+        self.values[offset + 4] = uncertainty if uncertainty is not None else 0.0
+        self.present[slot] = 1
+    # end def
+
+    def __getitem__(self, rangeValue):
+        if not isinstance(rangeValue, int):
+            raise KeyError(rangeValue)
+        # end if
+        slot = recordSlot(rangeValue)
+        if not self.present[slot]:
+            raise KeyError(rangeValue)
+        # end if
+        return CalRecord(self.values, slot * len(RECORD_FIELDS))
+    # end def
+
+    def __iter__(self):
+        for slot in range(0, 42):
+            if self.present[slot]:
+                yield (slot + 1 if slot < 21 else slot + 80)
+            # end if
+        # end for
+    # end def
+
+    def __len__(self):
+        return sum(self.present)
+    # end def
+# end class
+
+
+class CalRecord:
+    # Thin view on one record in ChannelRecords
+    __slots__ = ('values', 'offset')
+
+    def __init__(self, values, offset):
+        self.values = values
+        self.offset = offset
+    # end def
+
+    @property
+    def refValue(self):
+        return self.values[self.offset]
+    # end def
+
+    @property
+    def measValue(self):
+        return self.values[self.offset + 1]
+    # end def
+
+    @property
+    def error(self):
+        return self.values[self.offset + 2]
+    # end def
+
+    @property
+    def tolerance(self):
+        return self.values[self.offset + 3]
+    # end def
+
+    @property
+    def uncertainty(self):
+        return self.values[self.offset + 4]
+    # end def
+
+    @uncertainty.setter
+    def uncertainty(self, value):
+        self.values[self.offset + 4] = value if value is not None else 0.0
+    # end def
+
+    def __str__(self):
+        return 'Ref: ' + str(self.refValue) + ' Meas: ' + str(self.measValue) + ' Error: ' + str(self.error) + ' Tolerance: ' + str(self.tolerance) + ' Uncertainty: ' + str(self.uncertainty)
+    # end def
+# end class
+
+
+class UncertaintyEngine:
+    def __init__(self, settings):
+        self.settings = settings
+
+        # Per range constants, see CTSChannel.getUncertainty for the scalar version of the same calculation
+        # Expanded uncertainty = 2 * sqrt(multimeter^2 + (shuntScale * (refValue / shuntDivisor))^2 + channel^2)
+        shuntInOhm = settings.calValueMOhmCalibrator / 1000
+        self.multimeterSq = [0.0] * 22
+        self.shuntScale = [0.0] * 22
+        self.shuntDivisor = [1.0] * 22
+        self.channelSq = [0.0] * 22
+        self.fixed = [0.0] * 22
+        self.isFixed = [False] * 22
+        for rangeValue in range(1, 22):
+            if rangeValue <= 8 or rangeValue == 10 or rangeValue == 11:
+                # I1, I2, I3 +/- 10%, in [mA]
+                if rangeValue <= 4:
+                    resolution = CTS_RESOLUTION_I1
+                elif rangeValue <= 8:
+                    resolution = CTS_RESOLUTION_I2
+                else:
+                    resolution = CTS_RESOLUTION_I3
+                # end if
+                multimeter = (settings.calUncertainty100mVMultimeter / 2) / shuntInOhm
+                self.shuntScale[rangeValue] = settings.calUncertaintyCalibrator / 2
+                self.shuntDivisor[rangeValue] = settings.calValueMOhmCalibrator
+                channel = resolution / sqrt(3)
+            elif rangeValue == 9 or rangeValue == 12:
+                # I3, +/- 90%, in [A]
+                multimeter = (settings.calUncertainty100mVMultimeter / (2 * 1000)) / shuntInOhm
+                self.shuntScale[rangeValue] = settings.calUncertaintyCalibrator / (2 * 1000)
+                self.shuntDivisor[rangeValue] = shuntInOhm
+                channel = CTS_RESOLUTION_I3 / (sqrt(3) * 1000)
+            elif rangeValue >= 13 and rangeValue <= 16:
+                # I4, in [A]
+                if rangeValue == 13 or rangeValue == 16:
+                    multimeter = (settings.calUncertainty1VMultimeter / 2) / shuntInOhm
+                else:
+                    multimeter = (settings.calUncertainty100mVMultimeter / (2 * 1000)) / shuntInOhm
+                # end if
+                self.shuntScale[rangeValue] = settings.calUncertaintyCalibrator / (2 * 1000)
+                self.shuntDivisor[rangeValue] = shuntInOhm
+                channel = CTS_RESOLUTION_I4 / sqrt(3)
+            elif rangeValue >= 17 and rangeValue <= 19:
+                # U, in [V] (no shunt component)
+                multimeter = (settings.calUncertainty1VMultimeter / 2) if rangeValue == 17 else (settings.calUncertainty10VMultimeter / 2)
+                channel = CTS_RESOLUTION_U / sqrt(3)
+            else:
+                # temperature tbd
+                multimeter = 0.0
+                channel = 0.0
+                self.fixed[rangeValue] = 0.25
+                self.isFixed[rangeValue] = True
+            # end if
+            self.multimeterSq[rangeValue] = multimeter * multimeter
+            self.channelSq[rangeValue] = channel * channel
+        # end for
+
+        # numpy copies of the tables are made once for all calls of compute
+        self.numpy = optionalModule('numpy')
+        if self.numpy is not None:
+            self.multimeterSqArray = self.numpy.array(self.multimeterSq)
+            self.shuntScaleArray = self.numpy.array(self.shuntScale)
+            self.shuntDivisorArray = self.numpy.array(self.shuntDivisor)
+            self.channelSqArray = self.numpy.array(self.channelSq)
+            self.fixedArray = self.numpy.array(self.fixed)
+            self.isFixedArray = self.numpy.array(self.isFixed)
+        # end if
+    # end def
+
+    def compute(self, channels):
+        numpy = self.numpy
+
+        # Collect the post measurements of all channels
+        records = []
+        rangeValues = []
+        for channel in channels:
+            for rangeValue, record in channel.records.items():
+                if rangeValue < 100:
+                    if numpy is None:
+                        # Fall back to the scalar calculation
+                        record.uncertainty = channel.getUncertainty(self.settings, rangeValue, False, record.refValue)
+                    else:
+                        records.append(record)
+                        rangeValues.append(rangeValue)
+                    # end if
+                # end if
+            # end for
+        # end for
+
+        if len(records) == 0:
+            return
+        # end if
+
+        # Same operations in the same order as the scalar calculation, so the results are identical
+        index = numpy.array(rangeValues, dtype=numpy.intp)
+        refValues = numpy.array([record.refValue for record in records], dtype=numpy.float64)
+        shunt = self.shuntScaleArray[index] * (refValues / self.shuntDivisorArray[index])
+        combined = numpy.sqrt(self.multimeterSqArray[index] + shunt * shunt + self.channelSqArray[index])
+        combined = numpy.where(self.isFixedArray[index], self.fixedArray[index], combined)
+        uncertainties = (combined * 2).tolist()
+
+        for record, uncertainty in zip(records, uncertainties):
+            record.uncertainty = uncertainty
+        # end for
+    # end def
+
+    def computeChannel(self, channel):
+        # Single channel of the streaming path, numpy costs more than it saves for 21 values
+        # Same tables and operations as compute, so the results are identical
+        for rangeValue, record in channel.records.items():
+            if rangeValue < 100:
+                if self.isFixed[rangeValue]:
+                    combined = self.fixed[rangeValue]
+                else:
+                    shunt = self.shuntScale[rangeValue] * (record.refValue / self.shuntDivisor[rangeValue])
+                    combined = sqrt(self.multimeterSq[rangeValue] + shunt * shunt + self.channelSq[rangeValue])
+                # end if
+                record.uncertainty = combined * 2
+            # end if
+        # end for
+    # end def
+# end class
+
+
+class Profiler:
+    # Wall time and rows read per stage and per channel, only collected with --profile
+    # Rows decoded = rows read from caldata.DB or the cache, rows matched = rows of the requested dates and devices
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.channels = {}
+        self.cProfiler = None
+    # end def
+
+    def addStage(self, name, seconds, rowsDecoded=0, rowsMatched=0):
+        if not self.enabled:
+            return
+        # end if
+        if name not in self.stages:
+            self.stages[name] = {'seconds': 0.0, 'calls': 0, 'rowsDecoded': 0, 'rowsMatched': 0}
+        # end if
+        stage = self.stages[name]
+        stage['seconds'] = stage['seconds'] + seconds
+        stage['calls'] = stage['calls'] + 1
+        stage['rowsDecoded'] = stage['rowsDecoded'] + rowsDecoded
+        stage['rowsMatched'] = stage['rowsMatched'] + rowsMatched
+    # end def
+
+    def addChannel(self, channelNumber, seconds, records):
+        # Summed over all reports in batch and server mode
+        if not self.enabled:
+            return
+        # end if
+        if channelNumber not in self.channels:
+            self.channels[channelNumber] = {'seconds': 0.0, 'calls': 0, 'records': 0}
+        # end if
+        channel = self.channels[channelNumber]
+        channel['seconds'] = channel['seconds'] + seconds
+        channel['calls'] = channel['calls'] + 1
+        channel['records'] = channel['records'] + records
+    # end def
+
+    def startCProfile(self):
+        import cProfile
+        self.cProfiler = cProfile.Profile()
+        self.cProfiler.enable()
+    # end def
+
+    def summary(self):
+        res = '{:<28}{:>12}{:>8}{:>15}{:>15}\n'.format('Stage', 'Time [s]', 'Calls', 'Rows decoded', 'Rows matched')
+        for name, stage in self.stages.items():
+            res = res + '{:<28}{:>12.4f}{:>8}{:>15}{:>15}\n'.format(name, stage['seconds'], stage['calls'], stage['rowsDecoded'], stage['rowsMatched'])
+        # end for
+        if len(self.channels) > 0:
+            res = res + '\n{:<28}{:>12}{:>8}{:>15}\n'.format('Channel', 'Time [ms]', 'Calls', 'Records')
+            for channelNumber in sorted(self.channels):
+                channel = self.channels[channelNumber]
+                res = res + '{:<28}{:>12.3f}{:>8}{:>15}\n'.format('CH' + ('0' if channelNumber < 10 else '') + str(channelNumber), channel['seconds'] * 1000, channel['calls'], channel['records'])
+            # end for
+        # end if
+        return res
+    # end def
+
+    def report(self, settings):
+        import json
+        if self.cProfiler is not None:
+            self.cProfiler.disable()
+            self.cProfiler.dump_stats(settings.cProfileFile)
+            self.cProfiler = None
+        # end if
+
+        colored_print(Fore.BLUE + '\n\nProfile:')
+        print(self.summary())
+        if settings.profileJsonFile is not None:
+            f = open(settings.profileJsonFile, 'w', encoding='utf-8')
+            json.dump({'stages': self.stages, 'channels': {str(channelNumber): channel for channelNumber, channel in sorted(self.channels.items())}}, f, indent=2)
+            f.close()
+            colored_print(Fore.GREEN + 'Profile written to "' + settings.profileJsonFile + '"')
+        # end if
+        if settings.cProfileFile is not None:
+            colored_print(Fore.GREEN + 'cProfile statistics written to "' + settings.cProfileFile + '"')
+        # end if
+    # end def
+# end class
+
+# Collects the profile of the whole run (see --profile)
+profiler = Profiler()
+
+
+###############################################################################
+# Settings
+###############################################################################
+
+def readCommandLineArgs():
+    '''
+    Read command line parameters
+    '''
+    parser = argparse.ArgumentParser(description='Read BaSyTec CTS calibration data and create report in typst format - Ver.: ' + VERSION)
+    parser.add_argument('-d',
+                        '--caldata',
+                        required=False,
+                        default=None,
+                        help='Caldata file [caldata.db], not needed with --source')
+    parser.add_argument('-c',
+                        '--channelfile',
+                        required=False,
+                        default=None,
+                        help='Channel file [channel.db], not needed with --source')
+    parser.add_argument('--source',
+                        required=False,
+                        default=None,
+                        help='Read caldata and channel data written by --convert instead of the Paradox files [*.sqlite or Parquet directory]')
+    parser.add_argument('--direct',
+                        required=False,
+                        action='store_true',
+                        help='Read caldata.DB from the memory mapped file instead of through pypxlib, falls back to pypxlib if the file is not supported (Default: false)')
+    parser.add_argument('--convert',
+                        required=False,
+                        default=None,
+                        help='Convert caldata.DB and channel.DB to SQLite [*.sqlite] or to a Parquet directory (needs pyarrow) and exit')
+    parser.add_argument('--trend',
+                        required=False,
+                        default=None,
+                        action='append',
+                        help='Write the calibration history of the device given by --serial to a file and exit, can be given more than once [*.csv, *.parquet (needs pyarrow) or *.typ]')
+    parser.add_argument('--scan',
+                        required=False,
+                        default=None,
+                        action='append',
+                        help='Write the out of spec channels of all devices to a file and exit, can be given more than once [*.csv or *.json]')
+    parser.add_argument('--factordiff',
+                        required=False,
+                        default=None,
+                        nargs=2,
+                        metavar=('OLD', 'NEW'),
+                        help='Compare the factors and offsets of two channel files and exit, each a channel.DB, a *.sqlite (--convert or --cache) or a Parquet directory')
+    parser.add_argument('--diffoutput',
+                        required=False,
+                        default=None,
+                        action='append',
+                        help='Write the changes found by --factordiff to a file instead of the console, can be given more than once [*.csv or *.json]')
+    parser.add_argument('--scanfrom',
+                        required=False,
+                        default=None,
+                        help='First calibration date included in --scan, dd/mm/yyyy (Default: no limit)')
+    parser.add_argument('--scanto',
+                        required=False,
+                        default=None,
+                        help='Last calibration date included in --scan, dd/mm/yyyy (Default: no limit)')
+    parser.add_argument('--check',
+                        required=False,
+                        action='store_true',
+                        help='Only validate the files, the calibration equipment file, the template and the batch manifest, without opening caldata.DB and channel.DB, and exit')
+    parser.add_argument('-n',
+                        '--numchannels',
+                        required=False,
                         type=int,
                         default=DEFAULT_CHANNELS,
                         help='Number of test in tests.db [optional parameter, either test number or test name need to be specified]')
     parser.add_argument('-e',
                         '--equipment',
-                        required=True,
-                        help='Calibration equipment data [equiptment.ini]')
+                        required=False,
+                        default=None,
+                        help='Calibration equipment data [equiptment.ini], not needed with --convert')
     parser.add_argument('-t',
                         '--template',
-                        required=True,
-                        help='Template for calibration report [*.typst]')
+                        required=False,
+                        default=None,
+                        help='Template for calibration report [*.typst], not needed with --convert')
+    parser.add_argument('-j',
+                        '--jobs',
+                        required=False,
+                        type=int,
+                        default=1,
+                        help='Number of PDF compilers run in parallel with --pdf (Default: 1)')
+    parser.add_argument('-b',
+                        '--batch',
+                        required=False,
+                        default=None,
+                        help='Manifest with one report per row [*.csv], generates all reports without prompting')
+    parser.add_argument('--cache',
+                        required=False,
+                        default=None,
+                        help='Directory for cached copies of caldata.DB and channel.DB, rebuilt automatically when a file changes, and for the reports written before (unchanged reports are skipped)')
+    parser.add_argument('--force',
+                        required=False,
+                        action='store_true',
+                        help='Write every report, even if the cache shows it is unchanged (Default: false)')
+    parser.add_argument('--pdf',
+                        required=False,
+                        action='store_true',
+                        help='Compile the generated reports to PDF with typst, uses --jobs parallel compilers (Default: false)')
+    parser.add_argument('--split',
+                        required=False,
+                        action='store_true',
+                        help='Write only the report data and import the template from a shared module written next to the reports (Default: false)')
+    parser.add_argument('--serve',
+                        required=False,
+                        type=int,
+                        default=None,
+                        help='Run a local report server on the given port (POST /report with the manifest columns as JSON, POST /reload after the DB files changed)')
+    parser.add_argument('--profile',
+                        required=False,
+                        action='store_true',
+                        help='Print time and rows read per stage and per channel at the end (Default: false)')
+    parser.add_argument('--profilejson',
+                        required=False,
+                        default=None,
+                        help='Write the --profile results to a JSON file (implies --profile)')
+    parser.add_argument('--cprofile',
+                        required=False,
+                        default=None,
+                        help='Write cProfile statistics of the run to a file, view with python -m pstats (implies --profile)')
+    parser.add_argument('--job',
+                        required=False,
+                        default=None,
+                        help='Job file with the report details [*.ini], see --serial etc. for the keys of its [Report] section')
+    parser.add_argument('--reportnumber', required=False, default=None, help='Report number [job file key: ReportNumber]')
+    parser.add_argument('--serial', required=False, default=None, help='Serial number of the tester [job file key: Serial]')
+    parser.add_argument('--receiveddate', required=False, default=None, help='Received date, dd/mm/yyyy [job file key: ReceivedDate]')
+    parser.add_argument('--caldate', required=False, default=None, help='Calibration date, dd/mm/yyyy [job file key: CalDate]')
+    parser.add_argument('--clientname', required=False, default=None, help='Client name [job file key: ClientName]')
+    parser.add_argument('--clientaddress1', required=False, default=None, help='Client address line 1 [job file key: ClientAddress1]')
+    parser.add_argument('--clientaddress2', required=False, default=None, help='Client address line 2 [job file key: ClientAddress2]')
+    parser.add_argument('--clientaddress3', required=False, default=None, help='Client address line 3 [job file key: ClientAddress3]')
+    parser.add_argument('--calbyname', required=False, default=None, help='Name of calibration operator [job file key: CalByName]')
+    parser.add_argument('--calbytitle', required=False, default=None, help='Title of calibration operator [job file key: CalByTitle]')
+    parser.add_argument('--approvedbyname', required=False, default=None, help='Name of calibration approver [job file key: ApprovedByName]')
+    parser.add_argument('--approvedbytitle', required=False, default=None, help='Title of calibration approver [job file key: ApprovedByTitle]')
     parser.add_argument('-v',
                         '--verbose',
                         required=False,
                         action='store_true',
                         help='Show more messages during processing (Default: false)')
 
-    return parser.parse_args()
+    return parser.parse_args()
+# end def
+
+def checkSettings(settings):
+    '''
+    Validate what initAndLoadSettings does not already check, without opening caldata.DB and channel.DB
+    '''
+    try:
+        if settings.batchFile is not None:
+            reports = readManifest(settings)
+            colored_print(Fore.GREEN + 'Manifest "' + settings.batchFile + '" has ' + str(len(reports)) + ' reports')
+        # end if
+        parquetFiles = [fileName for fileName in (settings.trendFiles or []) if fileName.lower().endswith('.parquet')]
+        if settings.dataSource is not None and not settings.dataSource.lower().endswith('.sqlite'):
+            parquetFiles.append(settings.dataSource)
+        # end if
+        if settings.convertTo is not None and not settings.convertTo.lower().endswith('.sqlite'):
+            parquetFiles.append(settings.convertTo)
+        # end if
+        for fileName in settings.factorDiff or []:
+            if os.path.isdir(fileName):
+                parquetFiles.append(fileName)
+            # end if
+        # end for
+        if len(parquetFiles) > 0 and importPyarrow() is None:
+            raise ValueError('Parquet data needs the pyarrow package: ' + ', '.join(parquetFiles))
+        # end if
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + str(error))
+         sys.exit(1)
+    # end exception
+
+    colored_print(Fore.GREEN + '\nCheck passed')
+# end def
+
+def initAndLoadSettings():
+    settings = Settings()
+
+    try:
+        settings.fromCommandLine(readCommandLineArgs())
+        if settings.factorDiff is not None:
+            # A factor diff only needs the two channel files
+            for fileName in settings.factorDiff:
+                if not os.path.exists(fileName):
+                    raise ValueError('File not found: ' + fileName)
+                # end if
+            # end for
+            for diffFile in settings.diffFiles or []:
+                if os.path.splitext(diffFile)[1].lower() not in ('.csv', '.json'):
+                    raise ValueError('Unknown factor diff file type: ' + diffFile)
+                # end if
+            # end for
+            return settings
+        # end if
+        if settings.dataSource is not None:
+            if settings.convertTo is not None:
+                raise ValueError('--convert reads the Paradox files, it cannot be used with --source')
+            # end if
+            if not os.path.exists(settings.dataSource):
+                raise ValueError('File not found: ' + settings.dataSource)
+        else:
+            if settings.channelFile is None or settings.calData is None:
+                raise ValueError('Caldata file (-d) and channel file (-c) or --source are required')
+            if not os.path.isfile(settings.channelFile):
+                raise ValueError('File not found: ' + settings.channelFile)
+            if not os.path.isfile(settings.calData):
+                raise ValueError('File not found: ' + settings.calData)
+        # end if
+        if settings.convertTo is not None:
+            # Only the data files are needed for a conversion
+            if settings.trendFiles is not None or settings.scanFiles is not None:
+                raise ValueError('--trend and --scan cannot be used with --convert')
+            # end if
+            return settings
+        # end if
+        if settings.scanFiles is not None:
+            # A scan only needs the data files
+            if settings.trendFiles is not None:
+                raise ValueError('--trend cannot be used with --scan')
+            # end if
+            for scanFile in settings.scanFiles:
+                if os.path.splitext(scanFile)[1].lower() not in ('.csv', '.json'):
+                    raise ValueError('Unknown scan file type: ' + scanFile)
+                # end if
+            # end for
+            if settings.scanFrom is not None and settings.scanTo is not None and settings.scanFrom > settings.scanTo:
+                raise ValueError('--scanfrom is after --scanto')
+            # end if
+            return settings
+        # end if
+        if settings.trendFiles is not None:
+            # A trend only needs the data files and the device
+            for trendFile in settings.trendFiles:
+                if os.path.splitext(trendFile)[1].lower() not in ('.csv', '.parquet', '.typ'):
+                    raise ValueError('Unknown trend file type: ' + trendFile)
+                # end if
+            # end for
+            if not settings.check:
+                settings.getSerial()
+            # end if
+            return settings
+        # end if
+        if settings.template is None or settings.calEquipmentFile is None:
+            raise ValueError('Template (-t) and calibration equipment file (-e) are required')
+        if not os.path.isfile(settings.template):
+            raise ValueError('File not found: ' + settings.template)
+        if not os.path.isfile(settings.calEquipmentFile):
+            raise ValueError('File not found: ' + settings.calEquipmentFile)
+        if settings.batchFile is not None and not os.path.isfile(settings.batchFile):
+            raise ValueError('File not found: ' + settings.batchFile)
+        if settings.jobFile is not None and not os.path.isfile(settings.jobFile):
+            raise ValueError('File not found: ' + settings.jobFile)
+
+        if settings.pdf:
+            settings.typstCompiler = findTypstCompiler()
+        # end if
+        readTemplate(settings)
+
+        # Get additional settings from user
+        colored_print(Fore.BLUE + '\n-- Basytec report generator --')
+        settings.getCalEquipmentFromFile()
+        if settings.jobFile is not None:
+            settings.getSettingsFromJobFile()
+        # end if
+        if settings.batchFile is not None or settings.servePort is not None or settings.check:
+            # Report details are read from the manifest or sent with each request
+            return settings
+        # end if
+        settings.getReportNumber()
+        settings.getSerial()
+        settings.getReceivedDate()
+        settings.getCalDate()
+        settings.getClientDetails()
+        settings.getCalStaff()
+        # settings.getCalEquipment()
+        settings.setOutputFile()
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + error.args[0])
+         sys.exit(1)
+    # end exception
+
+    if settings.verbose:
+        colored_print(Fore.BLUE + '\n\nSettings:')
+        print(settings)
+    # end if
+
+    return settings
+# end def
+
+
+###############################################################################
+# Reading calibration data
+###############################################################################
+
+def printProgressBar(percentage, label, reset, rowsPerSecond=None):
+    if percentage < 0:
+        percentage = 0
+    elif percentage > 100:
+        percentage = 100
+    # end if
+
+    numFullBlocks = int(percentage / 8)
+    partialBlock = percentage % 8
+    indicator = ['█'] * numFullBlocks
+    if partialBlock == 1:
+        indicator.append('▏')
+    elif partialBlock == 2:
+        indicator.append('▎')
+    elif partialBlock == 3:
+        indicator.append('▍')
+    elif partialBlock == 4:
+        indicator.append('▌')
+    elif partialBlock == 5:
+        indicator.append('▋')
+    elif partialBlock == 6:
+        indicator.append('▊')
+    elif partialBlock == 7:
+        indicator.append('▉')
+    # end if
+    indicatorString = ''.join(indicator)
+    rateString = ('  ' + '{:.0f}'.format(rowsPerSecond) + ' rows/s') if rowsPerSecond is not None else ''
+    print(Fore.BLUE + label + '  ' + str(percentage) + '%  ' + Style.RESET_ALL + Fore.GREEN + indicatorString + Style.RESET_ALL + rateString, end= ('\r' if not reset else '\n'))
+# end def
+
+def formatChannelId(deviceId, channelNumber):
+    # Channel_Id of caldata.DB and Id of channel.DB, e.g. '724 CH05 CTS'
+    return str(deviceId) + ' CH' + ('' if channelNumber > 9 else '0') +  str(channelNumber) + ' CTS'
+# end def
+
+def channelDataKey(settings, calDataIndex, channelFactors):
+    '''
+    Hash of everything the channel arrays of a report are made of: the caldata rows and factors of its channels,
+    the calibration equipment values used for the uncertainty and the layout of the arrays
+    '''
+    import hashlib
+    digest = hashlib.sha256()
+    digest.update(repr((VERSION, settings.numChannels, CHANNEL_ARRAY_FORMAT,
+                        settings.calValueMOhmCalibrator, settings.calUncertaintyCalibrator, settings.calUncertainty100mVMultimeter,
+                        settings.calUncertainty1VMultimeter, settings.calUncertainty10VMultimeter)).encode('utf-8'))
+    for channelNumber in range(0, settings.numChannels):
+        channelId = formatChannelId(settings.deviceId, channelNumber)
+        rows = [calDataIndex.get((settings.calDate, channelId, entryNumber, preMeasurement)) for entryNumber in range(1, 43) for preMeasurement in (True, False)]
+        factors = channelFactors.get(channelId)
+        digest.update(repr((channelId, rows, sorted(factors.items()) if factors is not None else None)).encode('utf-8'))
+    # end for
+    return digest.hexdigest()
+# end def
+
+def extractChannel(settings, channelNumber, calDataIndex, channelFactors):
+    '''
+    Extract the records and factors of a single channel from the caldata and channel file indexes
+    '''
+    # Define channel ID to search for
+    channelId = formatChannelId(settings.deviceId, channelNumber)
+    channel = CTSChannel(channelNumber)
+
+    # Determine range based on channel number
+    if channelNumber % 2 == 0:
+        # First channel has a range from 1 to 21
+        rangeFrom = 1
+        rangeTo = 22
+    else:
+        # Second channel has a range from 22 to 42
+        rangeFrom = 22
+        rangeTo = 43
+    # end if
+
+    # Read caldata
+    for entryNumber in range(rangeFrom, rangeTo):
+        for preMeasurement in (True, False):
+            tableRow = calDataIndex.get((settings.calDate, channelId, entryNumber, preMeasurement))
+            if tableRow is None:
+                continue
+            # end if
+            refValue, measValue, error, tolerance = tableRow
+
+            # Store record
+            channel.addRecord((entryNumber if entryNumber < 22 else entryNumber - 21), preMeasurement, refValue, measValue, error, tolerance)
+            if abs(error) > tolerance:
+                # Channel out of spec
+                channel.setOufOfSpec(preMeasurement, (entryNumber if entryNumber < 22 else entryNumber - 21))
+            # end if
+        # end for
+    # end for
+
+    # Read channelfile
+    tableRow = channelFactors.get(channelId)
+    if tableRow is not None:
+        # Found correct record, save out params
+        channel.setFactors(*[{'factor': tableRow[factorColumn], 'offset': tableRow[offsetColumn]} for rangeName, factorColumn, offsetColumn in CHANNEL_FACTOR_RANGES])
+    # end if
+
+    return channel
+# end def
+
+def writeExtractedChannel(engine, writer, cts, channel):
+    start = time.perf_counter()
+    engine.computeChannel(channel)
+    profiler.addStage('uncertainty', time.perf_counter() - start)
+    writer.writeChannel(channel)
+    cts.keepOutOfSpec(channel.channelNumber, channel.preOutOfSpec, channel.postOutOfSpec)
+# end def
+
+def readCalibrationData(settings, cts, writer=None):
+    '''
+    Extract all channels of the report into cts
+    With a ReportWriter, the uncertainty of every channel is computed and its array written as soon as the channel is extracted,
+    afterwards cts only keeps the out of spec ranges of the channel
+    '''
+    # cts.readChannel(0)
+    # return
+
+    # Prepare progress bar
+    progress = 0.0
+    pInc = 100 / settings.numChannels
+    progressLabel = 'Reading caldata.DB and channel.DB...'
+    print('\n\n')
+    printProgressBar(int(progress), progressLabel, False)
+
+    # Build the indexes once for all channels
+    if cts.source.calDataIndex is None:
+        cts.source.indexCalData([settings.calDate], [settings.deviceId])
+    # end if
+    if cts.source.channelFactors is None:
+        cts.source.indexChannelFile()
+    # end if
+
+    # Channels are only extracted if the result cache has no arrays for the same data
+    resultCache = openResultCache(settings)
+    if resultCache is not None:
+        start = time.perf_counter()
+        cts.dataKey = channelDataKey(settings, cts.source.calDataIndex, cts.source.channelFactors)
+        block = resultCache.getBlock(cts.dataKey)
+        profiler.addStage('read result cache', time.perf_counter() - start)
+        if block is not None:
+            cts.restoreChannels(*block)
+            printProgressBar(100, progressLabel, True)
+            return
+        # end if
+    # end if
+
+    # Channels are extracted in this process: with the indexes built, a channel is a few dictionary lookups and its uncertainty
+    # a few microseconds, less than handing the indexes and the channel to a worker process and back
+    engine = UncertaintyEngine(settings)
+    start = time.perf_counter()
+    for channel in range(0, settings.numChannels):
+        cts.readChannel(channel)
+        if writer is not None:
+            writeExtractedChannel(engine, writer, cts, cts.channels[channel])
+        # end if
+        progress = progress + pInc
+        printProgressBar(int(progress), progressLabel, False)
+    # end for
+
+    profiler.addStage('extract channels', time.perf_counter() - start)
+
+    if writer is None:
+        # Uncertainty of all post measurements in one pass
+        start = time.perf_counter()
+        engine.compute(cts.channels.values())
+        profiler.addStage('uncertainty', time.perf_counter() - start)
+    # end if
+
+    # Print final progress bar
+    printProgressBar(int(progress), progressLabel, True)
+# end def
+
+
+###############################################################################
+# Writing output file
+###############################################################################
+
+def sanitizeTypst(string):
+    # Escape typst control characters
+    res = string.replace('#', '\\#')
+    res = res.replace('@', '\\@')
+    res = res.replace('$', '\\$')
+    return res
+# end def
+
+class ReportTemplate:
+    # Template text held in memory, reloaded and validated again only when the file changes
+    def __init__(self, templateFile):
+        self.templateFile = templateFile
+        self.mtime = None
+        self.text = None
+        self.moduleText = None
+    # end def
+
+    def validate(self, text):
+        # Ignore the examples in comments, only the actual template counts
+        code = re.sub(r'/\*.*?\*/', '', text, flags=re.DOTALL)
+        code = re.sub(r'//[^\n]*', '', code)
+
+        missing = []
+        for name in TEMPLATE_FUNCTIONS:
+            if re.search(r'#let\s+' + name + r'\s*\(', code) is None:
+                missing.append('#let ' + name)
+            # end if
+        # end for
+        for name in REPORT_PARAMETERS:
+            if re.search(r'\b' + name + r'\b', code) is None:
+                missing.append(name)
+            # end if
+        # end for
+        if len(missing) > 0:
+            raise ValueError('Template ' + self.templateFile + ' is missing: ' + ', '.join(missing))
+        # end if
+    # end def
+
+    def get(self):
+        mtime = os.stat(self.templateFile).st_mtime_ns
+        if mtime != self.mtime:
+            start = time.perf_counter()
+            f = open(self.templateFile, 'r', encoding='utf-8')
+            text = f.read()
+            f.close()
+
+            self.validate(text)
+            self.text = text
+            self.moduleText = None
+            self.mtime = mtime
+            profiler.addStage('read template', time.perf_counter() - start)
+        # end if
+        return self.text
+    # end def
+
+    def getModule(self):
+        # The template wrapped into a function, so it can be imported by reports written with --split
+        # Report parameters become function arguments, the channel tables are created from the channels argument
+        text = self.get()
+        if self.moduleText is None:
+            self.moduleText = ('// Generated from ' + os.path.basename(self.templateFile) + ' by report_gen.py, do not edit\n' +
+                               '#let calreport(' + ', '.join(name + ': none' for name in REPORT_PARAMETERS) + ', channels: ()) = [\n' +
+                               text + '\n' +
+                               '#for channel in channels [#makechannel(channel.at(0), channel.at(1), lastChannel: channel.at(2))]\n' +
+                               ']\n')
+        # end if
+        return self.moduleText
+    # end def
+# end class
+
+# Loaded templates by file name
+templates = {}
+
+def readTemplate(settings):
+    if settings.template not in templates:
+        templates[settings.template] = ReportTemplate(settings.template)
+    # end if
+
+    return templates[settings.template].get()
+# end def
+
+def writeParameters(settings, cts, f):    
+    f.write('#let signer_name = [' + sanitizeTypst(settings.approvedByName) + ']\n')
+    f.write('#let signer_title = [' + sanitizeTypst(settings.approvedByTitle) + ']\n')
+
+    f.write('#let calibrated_by = [' + sanitizeTypst(settings.calByName) + ']\n')
+    f.write('#let calibrated_by_title = [' + sanitizeTypst(settings.calByTitle) + ']\n')
+
+    f.write('#let report_number = [' + sanitizeTypst(settings.reportNumber) + ']\n')
+
+    f.write('#let submitter_company = [' + sanitizeTypst(settings.clientName) + ']\n')
+    f.write('#let submitter_company_address = [' + sanitizeTypst(settings.clientAddress1) + '\\ ' + sanitizeTypst(settings.clientAddress2) + '\\ ' + sanitizeTypst(settings.clientAddress3) + ']\n')
+
+    f.write('#let tester_model = [CTS ' + str(settings.numChannels) + ' channel]\n')
+    f.write('#let tester_serial = [' + settings.serialNumber + ']\n')
+    f.write('#let tester_id = [' + str(settings.deviceId) + ']\n')
+
+    f.write('#let date_received = [' + settings.receivedDate.strftime('%d/%m/%Y') + ']\n')
+    f.write('#let date_calibrated = [' + settings.calDate.strftime('%d/%m/%Y') + ']\n')
+    f.write('#let date_recommended = [' + settings.recommendedNextCal.strftime('%d/%m/%Y') + ']\n')
+
+    f.write('#let calibration_sop = [' + sanitizeTypst(SOP_NAME) + ']\n')
+    f.write('#let calibration_sop_date = [' + sanitizeTypst(SOP_DATE) + ']\n')
+    f.write('#let software_version = [' + sanitizeTypst(SOFTWARE_VERSION) + ']\n')
+
+    f.write('#let multimeter_due = [' + settings.calDateMultimeter.strftime('%d/%m/%Y') + ']\n')
+    f.write('#let multimeter_report = [' + sanitizeTypst(settings.calReportMultimeter) + ']\n')
+    f.write('#let calibrator_due = [' + settings.calDateCalibrator.strftime('%d/%m/%Y') + ']\n')
+    f.write('#let calibrator_report = [' + sanitizeTypst(settings.calReportCalibrator) + ']\n')
+
+    # Determine if any parameter was out of specification
+    preOutOfSpec = ''
+    postOutOfSpec = ''
+    for key, channel in cts.channels.items():
+        if len(channel.preOutOfSpec) > 0:
+            preOutOfSpecRange = None
+            if len(preOutOfSpec) > 0:
+                preOutOfSpec = preOutOfSpec + '; '
+            # end if
+            for rangeOOS in sortRanges(channel.preOutOfSpec):
+                preOutOfSpecRange = (preOutOfSpecRange + '; ' + rangeOOS if preOutOfSpecRange is not None else rangeOOS) 
+            # end for
+            preOutOfSpec = preOutOfSpec + 'CH' + ('0' if channel.channelNumber < 10 else '') + str(channel.channelNumber) + ' (' + preOutOfSpecRange + ')'
+        # end if
+
+        if len(channel.postOutOfSpec) > 0:
+            postOutOfSpecRange = None
+            if len(postOutOfSpec) > 0:
+                postOutOfSpec = postOutOfSpec + '; '
+            # end if
+            for rangeOOS in sortRanges(channel.postOutOfSpec):
+                postOutOfSpecRange = (postOutOfSpecRange + '; ' + rangeOOS if postOutOfSpecRange is not None else rangeOOS) 
+            # end for
+            postOutOfSpec = postOutOfSpec + 'CH' + ('0' if channel.channelNumber < 10 else '') + str(channel.channelNumber) + ' (' + postOutOfSpecRange + ')'
+        # end if
+    # end for
+    f.write('#let condition_received_tolerance = [' + ('YES' if len(preOutOfSpec) == 0 else 'NO') + ']\n')
+    f.write('#let condition_received_remark = [' + ('N/A' if len(preOutOfSpec) == 0 else preOutOfSpec ) +']\n')
+    f.write('#let condition_shipped_tolerance = [' + ('YES' if len(postOutOfSpec) == 0 else 'NO') + ']\n')
+    f.write('#let condition_shipped_remark = [' + ('N/A' if len(postOutOfSpec) == 0 else postOutOfSpec ) +']\n')
+    f.write('\n')
+# end def
+
+def buildChannelArrayLayout():
+    '''
+    Expand CHANNEL_ARRAY_ENTRIES into the (record key, field, format) layout of a channel array
+    '''
+    layout = []
+    for entryNumber, valueFormat, foundDeviation, leftDeviation in CHANNEL_ARRAY_ENTRIES:
+        layout.append((entryNumber + 100, 'refValue', valueFormat))     # "af ... av"
+        layout.append((entryNumber + 100, 'measValue', valueFormat))    # "af ... mv"
+        layout.append((entryNumber + 100, 'error', foundDeviation))     # "af ... dv"
+        layout.append((entryNumber, 'refValue', valueFormat))           # "al ... av"
+        layout.append((entryNumber, 'measValue', valueFormat))          # "al ... mv"
+        layout.append((entryNumber, 'error', leftDeviation))            # "al ... dv"
+        layout.append((entryNumber, 'uncertainty', valueFormat))        # "... uc"
+    # end for
+    return tuple(layout)
+# end def
+
+CHANNEL_ARRAY_LAYOUT = buildChannelArrayLayout()
+
+# Position of every CHANNEL_ARRAY_LAYOUT value inside ChannelRecords.values
+CHANNEL_ARRAY_OFFSETS = tuple(recordSlot(recordKey) * len(RECORD_FIELDS) + RECORD_FIELDS.index(field) for recordKey, field, formatter in CHANNEL_ARRAY_LAYOUT)
+
+# Format of a complete channel array, filled with the values of CHANNEL_ARRAY_LAYOUT followed by CHANNEL_FACTOR_LAYOUT
+CHANNEL_ARRAY_FORMAT = ''.join(entry[2] for entry in CHANNEL_ARRAY_LAYOUT) + ''.join(entry[2] for entry in CHANNEL_FACTOR_LAYOUT)
+
+def formatChannelArray(settings, channel):
+    # Every record and factor of the channel is needed, report the first missing one
+    records = channel.records
+    calDate = settings.calDate.strftime('%d/%m/%Y')
+    if not any(records.present):
+        raise ValueError('No calibration data for device ' + str(settings.deviceId) + ' on ' + calDate)
+    # end if
+    if not all(records.present):
+        for recordKey, field, formatter in CHANNEL_ARRAY_LAYOUT:
+            if recordKey not in records:
+                raise ValueError('Calibration data of device ' + str(settings.deviceId) + ' on ' + calDate + ' incomplete: channel ' + str(channel.channelNumber) + \
+                                 ' has no ' + ('pre' if recordKey > 100 else 'post') + ' measurement of entry ' + str(recordKey % 100))
+            # end if
+        # end for
+    # end if
+    if len(channel.factors) == 0:
+        raise ValueError('No calibration factors for channel ' + formatChannelId(settings.deviceId, channel.channelNumber) + ' in ' + settings.channelFile)
+    # end if
+
+    values = [records.values[offset] for offset in CHANNEL_ARRAY_OFFSETS]
+    for factorKey, field, formatter in CHANNEL_FACTOR_LAYOUT:
+        values.append(channel.factors[factorKey][field])
+    # end for
+
+    return '#let array' + str(channel.channelNumber) + ' = (\n' + CHANNEL_ARRAY_FORMAT.format(*values) + ')\n\n'
+# end def
+
+def writeChannelArrays(settings, cts, f):
+    # Arrays restored from the result cache are written as they are
+    if cts.channelArrays is not None:
+        f.write(cts.channelArrays)
+        return
+    # end if
+
+    # One write per channel, the arrays are only kept for the result cache
+    resultCache = openResultCache(settings)
+    channelArrays = []
+    for key, channel in cts.channels.items():
+        channelArray = formatChannelArray(settings, channel)
+        f.write(channelArray)
+        if resultCache is not None:
+            channelArrays.append(channelArray)
+        # end if
+    # end for
+    if resultCache is not None:
+        cts.channelArrays = ''.join(channelArrays)
+    # end if
+# end def
+
+def storeChannelBlock(settings, cts):
+    # Channel arrays just written go to the result cache, so a report with the same data does not extract its channels again
+    resultCache = openResultCache(settings)
+    if resultCache is None or cts.dataKey is None or cts.cachedBlock or cts.channelArrays is None:
+        return
+    # end if
+
+    channels = [[channel.channelNumber, sortRanges(channel.preOutOfSpec), sortRanges(channel.postOutOfSpec)] for channel in cts.channels.values()]
+    resultCache.putBlock(cts.dataKey, channels, cts.channelArrays)
+# end def
+
+
+def writeChannelFunctions(cts, f):
+    for key, channel in cts.channels.items():
+        f.write('#makechannel(' + str(channel.channelNumber) + ', array' + str(channel.channelNumber) + (', lastChannel: true' if cts.numChannels == (channel.channelNumber + 1) else '')+ ')\n')
+    # end for
+# end def
+
+def templateModuleFile(settings):
+    # Shared template module is written next to the reports
+    return os.path.join(os.path.dirname(settings.outputFile), os.path.splitext(os.path.basename(settings.template))[0] + '_module.typ')
+# end def
+
+def writeTemplateModule(settings):
+    # Only rewritten when the content changed, so typst can keep using its cached copy
+    moduleFile = templateModuleFile(settings)
+    moduleText = templates[settings.template].getModule()
+    if os.path.isfile(moduleFile):
+        f = open(moduleFile, 'r', encoding='utf-8')
+        existingText = f.read()
+        f.close()
+        if existingText == moduleText:
+            return
+        # end if
+    # end if
+
+    f = open(moduleFile, 'w', encoding='utf-8')
+    f.write(moduleText)
+    f.close()
+# end def
+
+def writeReportCall(cts, f):
+    f.write('#calreport(\n')
+    for name in REPORT_PARAMETERS:
+        f.write('  ' + name + ': ' + name + ',\n')
+    # end for
+    f.write('  channels: (\n')
+    for key, channel in cts.channels.items():
+        f.write('    (' + str(channel.channelNumber) + ', array' + str(channel.channelNumber) + ', ' + ('true' if cts.numChannels == (channel.channelNumber + 1) else 'false') + '),\n')
+    # end for
+    f.write('  ),\n')
+    f.write(')\n')
+# end def
+
+def reportCacheKey(settings, cts, template):
+    # Hash of the channel data, the report header, the template and the output layout
+    import hashlib
+    header = io.StringIO()
+    writeParameters(settings, cts, header)
+    digest = hashlib.sha256()
+    digest.update(repr((cts.dataKey, settings.split, header.getvalue(), template)).encode('utf-8'))
+    return digest.hexdigest()
+# end def
+
+class ReportWriter:
+    '''
+    Writes a report through a temporary file, which replaces the report in finish
+    The channel arrays can be written while the channels are extracted (see readCalibrationData),
+    parameters, template and makechannel calls need all channels and follow in finish
+    '''
+    def __init__(self, settings):
+        self.settings = settings
+        self.tmpFile = settings.outputFile + '.tmp'
+        self.f = None
+        self.numChannels = 0
+        self.arraysStart = 0
+    # end def
+
+    def open(self):
+        if self.f is None:
+            self.f = open(self.tmpFile, 'w', encoding='utf-8')
+            if self.settings.split:
+                # Report only holds its data and imports the shared template module
+                self.f.write('#import "' + os.path.basename(templateModuleFile(self.settings)) + '": calreport\n\n')
+            # end if
+            self.arraysStart = self.f.tell()
+        # end if
+    # end def
+
+    def readChannelArrays(self):
+        # Arrays written so far, read back from the file for the result cache instead of keeping them in memory
+        self.f.flush()
+        f = open(self.tmpFile, 'r', encoding='utf-8')
+        f.seek(self.arraysStart)
+        channelArrays = f.read()
+        f.close()
+        return channelArrays
+    # end def
+
+    def writeChannel(self, channel):
+        # The channel needs its uncertainty, the array is flushed right away
+        start = time.perf_counter()
+        self.open()
+        try:
+            channelArray = formatChannelArray(self.settings, channel)
+        except Exception:
+            self.discard()
+            raise
+        # end exception
+        self.f.write(channelArray)
+        self.f.flush()
+        self.numChannels = self.numChannels + 1
+        profiler.addStage('write channel arrays', time.perf_counter() - start)
+    # end def
+
+    def finish(self, cts, template):
+        self.open()
+        f = self.f
+
+        # Write channel data, unless it was written during extraction
+        if self.numChannels == 0:
+            start = time.perf_counter()
+            writeChannelArrays(self.settings, cts, f)
+            profiler.addStage('write channel arrays', time.perf_counter() - start)
+        elif cts.dataKey is not None and not cts.cachedBlock:
+            cts.channelArrays = self.readChannelArrays()
+        # end if
+
+        # Write parameters into output file
+        start = time.perf_counter()
+        writeParameters(self.settings, cts, f)
+        profiler.addStage('write parameters', time.perf_counter() - start)
+
+        if self.settings.split:
+            start = time.perf_counter()
+            writeReportCall(cts, f)
+            profiler.addStage('write report call', time.perf_counter() - start)
+        else:
+            # Write the actual template into the output file
+            start = time.perf_counter()
+            f.write(template)
+            profiler.addStage('write template', time.perf_counter() - start)
+
+            # Write the function calls to create the channel table at the end of the template
+            start = time.perf_counter()
+            writeChannelFunctions(cts, f)
+            profiler.addStage('write channel functions', time.perf_counter() - start)
+        # end if
+        f.close()
+        self.f = None
+        os.replace(self.tmpFile, self.settings.outputFile)
+    # end def
+
+    def discard(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+            os.remove(self.tmpFile)
+        # end if
+    # end def
+# end class
+
+def writeData(settings, cts, template, writer=None):
+    '''
+    Write the report, returns False if it was skipped because the result cache shows it is unchanged
+    writer holds the channel arrays written by readCalibrationData, if any
+    '''
+    if writer is None:
+        writer = ReportWriter(settings)
+    # end if
+    if settings.split:
+        readTemplate(settings)
+        writeTemplateModule(settings)
+    # end if
+
+    resultCache = openResultCache(settings)
+    reportKey = None
+    if resultCache is not None and cts.dataKey is not None:
+        reportKey = reportCacheKey(settings, cts, template)
+        if not settings.force and resultCache.isCurrent(settings.outputFile, reportKey):
+            writer.discard()
+            return False
+        # end if
+    # end if
+
+    try:
+        writer.finish(cts, template)
+    except Exception:
+        writer.discard()
+        raise
+    # end exception
+    storeChannelBlock(settings, cts)
+
+    if reportKey is not None:
+        resultCache.putReport(settings.outputFile, reportKey)
+    # end if
+    return True
+# end def
+
+###############################################################################
+# PDF compilation
+###############################################################################
+
+def findTypstCompiler():
+    '''
+    Use the typst python package if installed, otherwise the typst binary on the PATH
+    '''
+    import shutil
+    if optionalModule('typst') is not None:
+        return 'module'
+    # end if
+    binary = shutil.which('typst')
+    if binary is None:
+        raise ValueError('PDF output needs the typst python package or the typst binary on the PATH')
+    # end if
+    return binary
+# end def
+
+def compilePdf(settings, typFile):
+    import subprocess
+    pdfFile = os.path.splitext(typFile)[0] + '.pdf'
+    start = time.perf_counter()
+    if settings.typstCompiler == 'module':
+        optionalModule('typst').compile(typFile, output=pdfFile)
+    else:
+        result = subprocess.run([settings.typstCompiler, 'compile', typFile, pdfFile], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise ValueError(result.stderr.strip())
+        # end if
+    # end if
+    return pdfFile, time.perf_counter() - start
+# end def
+
+def pdfIsCurrent(typFile):
+    # PDF exists and was compiled after the report was last written
+    pdfFile = os.path.splitext(typFile)[0] + '.pdf'
+    return os.path.isfile(pdfFile) and os.stat(pdfFile).st_mtime_ns >= os.stat(typFile).st_mtime_ns
+# end def
+
+def compileReports(settings, typFiles):
+    # Compile all reports with up to settings.jobs compilers in parallel, returns False if any of them failed
+    progress = 0.0
+    pInc = 100 / len(typFiles)
+    progressLabel = 'Compiling PDF...'
+    print('\n')
+    printProgressBar(int(progress), progressLabel, False)
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    start = time.perf_counter()
+    timings = []
+    failed = []
+    with ThreadPoolExecutor(max_workers=settings.jobs) as executor:
+        futures = {}
+        for typFile in typFiles:
+            futures[executor.submit(compilePdf, settings, typFile)] = typFile
+        # end for
+        for future in as_completed(futures):
+            try:
+                timings.append(future.result())
+                profiler.addStage('compile pdf', timings[-1][1])
+            except Exception as error:
+                failed.append((futures[future], str(error)))
+            # end exception
+            progress = progress + pInc
+            printProgressBar(int(progress), progressLabel, False)
+        # end for
+    # end with
+    printProgressBar(int(progress), progressLabel, True)
+
+    for pdfFile, seconds in timings:
+        colored_print(Fore.GREEN + 'PDF "' + pdfFile + '" created in ' + '{:.2f}'.format(seconds) + ' s')
+    # end for
+    for typFile, message in failed:
+        colored_print(Fore.RED + 'ERROR: Compiling "' + typFile + '" failed: ' + message)
+    # end for
+    colored_print(Fore.BLUE + str(len(timings)) + ' of ' + str(len(typFiles)) + ' PDF created in ' + '{:.2f}'.format(time.perf_counter() - start) + ' s')
+
+    return len(failed) == 0
+# end def
+
+
+###############################################################################
+# Data conversion
+###############################################################################
+
+def convertCalDataRows(backend):
+    # Rows of caldata.DB in the storage format of TableCache (Date as ISO date, Device is the device ID part of Channel_Id)
+    for row in backend.streamCalData(None, None):
+        yield (row[0].isoformat(), row[1].split(' CH', 1)[0]) + row[1:]
+    # end for
+# end def
+
+def writeSqliteData(backend, dbFile):
+    import sqlite3
+    tmpFile = dbFile + '.tmp'
+    if os.path.isfile(tmpFile):
+        os.remove(tmpFile)
+    # end if
+
+    connection = sqlite3.connect(tmpFile)
+    writeSqliteTable(connection, 'caldata', ('Date', 'Device') + CALDATA_COLUMNS[1:], convertCalDataRows(backend), ('Date', 'Device'))
+    writeSqliteTable(connection, 'channel', ('Id',) + CHANNEL_FACTOR_COLUMNS, backend.readChannelFactors(None), ('Id',))
+    connection.commit()
+    connection.close()
+    os.replace(tmpFile, dbFile)
+# end def
+
+def writeParquetTable(fileName, schema, rows):
+    # Written in row groups of CONVERT_BATCH_ROWS rows, the statistics of each group let readers skip it
+    pyarrow = importPyarrow()
+    tmpFile = fileName + '.tmp'
+    writer = pyarrow.parquet.ParquetWriter(tmpFile, schema)
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == CONVERT_BATCH_ROWS:
+            writer.write_table(pyarrow.Table.from_pylist([dict(zip(schema.names, batchRow)) for batchRow in batch], schema=schema))
+            batch = []
+        # end if
+    # end for
+    if len(batch) > 0:
+        writer.write_table(pyarrow.Table.from_pylist([dict(zip(schema.names, batchRow)) for batchRow in batch], schema=schema))
+    # end if
+    writer.close()
+    os.replace(tmpFile, fileName)
+# end def
+
+def writeParquetData(backend, directory):
+    pyarrow = importPyarrow()
+    if pyarrow is None:
+        raise ValueError('Parquet output needs the pyarrow package')
+    # end if
+    os.makedirs(directory, exist_ok=True)
+
+    calDataSchema = pyarrow.schema([('Date', pyarrow.string()), ('Device', pyarrow.string()), ('Channel_Id', pyarrow.string()), ('No', pyarrow.int64()), ('Range', pyarrow.string())] +
+                                   [(column, pyarrow.float64()) for column in CALDATA_COLUMNS[4:]])
+    channelSchema = pyarrow.schema([('Id', pyarrow.string())] + [(column, pyarrow.float64()) for column in CHANNEL_FACTOR_COLUMNS])
+    writeParquetTable(os.path.join(directory, 'caldata.parquet'), calDataSchema, convertCalDataRows(backend))
+    writeParquetTable(os.path.join(directory, 'channel.parquet'), channelSchema, backend.readChannelFactors(None))
+# end def
+
+def convertData(settings):
+    '''
+    Copy caldata.DB and channel.DB into a SQLite database or Parquet files, which can be read with --source
+    '''
+    backend = ParadoxBackend(settings.calData, settings.channelFile, settings.cacheDir, settings.direct)
+    start = time.perf_counter()
+    try:
+        if settings.convertTo.lower().endswith('.sqlite'):
+            writeSqliteData(backend, settings.convertTo)
+        else:
+            writeParquetData(backend, settings.convertTo)
+        # end if
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + str(error))
+         sys.exit(1)
+    # end exception
+    backend.close()
+
+    colored_print(Fore.GREEN + '\n' + str(backend.rowsDecoded) + ' rows of caldata.DB converted to "' + settings.convertTo + '" in ' + '{:.2f}'.format(time.perf_counter() - start) + ' s')
+# end def
+
+
+###############################################################################
+# Trend extraction
+###############################################################################
+
+# Columns of a trend file, one row per measurement
+TREND_COLUMNS = ('Date', 'Channel', 'Entry', 'Range', 'Measurement', 'RefValue', 'MeasValue', 'Error', 'Tolerance', 'Quality')
+
+def extractTrend(settings, source):
+    '''
+    Extract every calibration of the device in settings.deviceId as rows of TREND_COLUMNS,
+    ordered by date, channel, entry and measurement (PRE before POST)
+    '''
+    # All dates of the device are indexed in a single pass over caldata
+    source.indexCalData(None, [settings.deviceId])
+
+    # The channels of every calibration are taken from caldata, the tester does not need to have settings.numChannels channels
+    channelsByDate = {}
+    for calDate, channelId, entryNumber, preMeasurement in source.calDataIndex:
+        channelPart = channelId.partition(' CH')[2].split(' ', 1)[0]
+        if channelPart.isdigit():
+            channelsByDate.setdefault(calDate, set()).add(int(channelPart))
+        # end if
+    # end for
+    calDates = sorted(channelsByDate)
+
+    start = time.perf_counter()
+    rows = []
+    dateSettings = copy.copy(settings)
+    for calDate in calDates:
+        dateSettings.calDate = calDate
+        for channelNumber in sorted(channelsByDate[calDate]):
+            # Factors are not part of the trend
+            channel = extractChannel(dateSettings, channelNumber, source.calDataIndex, {})
+            for entryNumber in range(1, 22):
+                for preMeasurement in (True, False):
+                    record = channel.records.get(entryNumber + (100 if preMeasurement else 0))
+                    if record is None:
+                        continue
+                    # end if
+                    quality = abs(record.error) / record.tolerance * 100 if record.tolerance != 0 else None
+                    rows.append((calDate, channelNumber, entryNumber, rangeOfEntry(entryNumber), 'PRE' if preMeasurement else 'POST',
+                                 record.refValue, record.measValue, record.error, record.tolerance, quality))
+                # end for
+            # end for
+        # end for
+    # end for
+    profiler.addStage('extract trend', time.perf_counter() - start, 0, len(rows))
+
+    return calDates, rows
+# end def
+
+def writeTrendCsv(fileName, rows):
+    import csv
+    with open(fileName, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(TREND_COLUMNS)
+        for row in rows:
+            writer.writerow((row[0].isoformat(),) + row[1:])
+        # end for
+    # end with
+# end def
+
+def writeTrendParquet(fileName, rows):
+    pyarrow = importPyarrow()
+    if pyarrow is None:
+        raise ValueError('Parquet output needs the pyarrow package')
+    # end if
+    schema = pyarrow.schema([('Date', pyarrow.date32()), ('Channel', pyarrow.int64()), ('Entry', pyarrow.int64()), ('Range', pyarrow.string()), ('Measurement', pyarrow.string())] +
+                            [(column, pyarrow.float64()) for column in TREND_COLUMNS[5:]])
+    writeParquetTable(fileName, schema, rows)
+# end def
+
+def formatTrendCell(quality):
+    if quality is None:
+        return '--'
+    # end if
+    text = '{:.1f}'.format(quality)
+    return ('*' + text + '*') if quality > 100 else text
+# end def
+
+def writeTrendTypst(settings, fileName, calDates, rows):
+    # One table per channel, a row per entry and a column per calibration date
+    # Each cell holds the quality of the pre / post measurement
+    qualities = {}
+    for row in rows:
+        qualities[(row[1], row[2], row[4], row[0])] = row[9]
+    # end for
+    channelNumbers = sorted(set(row[1] for row in rows))
+
+    with open(fileName, 'w', encoding='utf-8') as f:
+        f.write('#set page(flipped: true, margin: 1.5cm)\n')
+        f.write('#set text(size: 8pt)\n\n')
+        f.write('= Calibration trend CTS ' + sanitizeTypst(settings.serialNumber) + '\n\n')
+        f.write('Quality = abs(error) / tolerance in %, pre / post measurement. Bold values are out of specification.\n\n')
+        for channelNumber in channelNumbers:
+            f.write('== Channel ' + str(channelNumber) + '\n\n')
+            f.write('#table(\n  columns: ' + str(len(calDates) + 2) + ',\n')
+            f.write('  [*Entry*], [*Range*], ' + ', '.join('[*' + calDate.strftime('%d/%m/%Y') + '*]' for calDate in calDates) + ',\n')
+            for entryNumber in range(1, 22):
+                cells = []
+                for calDate in calDates:
+                    pre = qualities.get((channelNumber, entryNumber, 'PRE', calDate))
+                    post = qualities.get((channelNumber, entryNumber, 'POST', calDate))
+                    cells.append('[' + formatTrendCell(pre) + ' / ' + formatTrendCell(post) + ']')
+                # end for
+                f.write('  [' + str(entryNumber) + '], [' + rangeOfEntry(entryNumber) + '], ' + ', '.join(cells) + ',\n')
+            # end for
+            f.write(')\n\n')
+        # end for
+    # end with
 # end def
 
-def initAndLoadSettings():
-    settings = Settings()
+def generateTrend(settings):
+    source = CalDataSource(openDataBackend(settings))
+    calDates, rows = extractTrend(settings, source)
+    source.backend.close()
+    if len(rows) == 0:
+        colored_print(Fore.RED + 'ERROR: No calibration data found for device ' + str(settings.deviceId))
+        sys.exit(1)
+    # end if
 
+    start = time.perf_counter()
     try:
-        settings.fromCommandLine(readCommandLineArgs())
-        if not os.path.isfile(settings.channelFile):
-            raise ValueError('File not found: ' + settings.channelFile)
-        if not os.path.isfile(settings.calData):
-            raise ValueError('File not found: ' + settings.calData)
-        if not os.path.isfile(settings.template):
-            raise ValueError('File not found: ' + settings.template)
-        if not os.path.isfile(settings.calEquipmentFile):
-            raise ValueError('File not found: ' + settings.calEquipmentFile)
-
-        # Get additional settings from user
-        colored_print(Fore.BLUE + '\n-- Basytec report generator --')
-        settings.getCalEquipmentFromFile()
-        settings.getReportNumber()
-        settings.getSerial()
-        settings.getReceivedDate()
-        settings.getCalDate()
-        settings.getClientDetails()
-        settings.getCalStaff()
-        # settings.getCalEquipment()
-        settings.setOutputFile()
+        for trendFile in settings.trendFiles:
+            extension = os.path.splitext(trendFile)[1].lower()
+            if extension == '.csv':
+                writeTrendCsv(trendFile, rows)
+            elif extension == '.parquet':
+                writeTrendParquet(trendFile, rows)
+            else:
+                writeTrendTypst(settings, trendFile, calDates, rows)
+            # end if
+            colored_print(Fore.GREEN + '\nTrend "' + trendFile + '" created sucessfully! (' + str(len(calDates)) + ' calibrations, ' + str(len(rows)) + ' measurements)')
+        # end for
     except Exception as error:
-         colored_print(Fore.RED + 'ERROR: ' + error.args[0])
+         colored_print(Fore.RED + 'ERROR: ' + str(error))
          sys.exit(1)
     # end exception
-
-    if settings.verbose:
-        colored_print(Fore.BLUE + '\n\nSettings:')
-        print(settings)
-    # end if
-
-    return settings
+    profiler.addStage('write trend', time.perf_counter() - start)
 # end def
 
 
 ###############################################################################
-# Reading calibration data
+# Out of spec scan
 ###############################################################################
 
-def printProgressBar(percentage, label, reset):
-    if percentage < 0:
-        percentage = 0
-    elif percentage > 100:
-        percentage = 100
-    # end if
+# Columns of a scan CSV file, one row per out of spec range of a channel
+SCAN_COLUMNS = ('Device', 'Date', 'Channel', 'Range', 'Measurement', 'Entries', 'WorstQuality')
 
-    numFullBlocks = int(percentage / 8)
-    partialBlock = percentage % 8
-    indicator = ['█'] * numFullBlocks
-    if partialBlock == 1:
-        indicator.append('▏')
-    elif partialBlock == 2:
-        indicator.append('▎')
-    elif partialBlock == 3:
-        indicator.append('▍')
-    elif partialBlock == 4:
-        indicator.append('▌')
-    elif partialBlock == 5:
-        indicator.append('▋')
-    elif partialBlock == 6:
-        indicator.append('▊')
-    elif partialBlock == 7:
-        indicator.append('▉')
+def scanCalData(settings, source):
+    '''
+    Find every range of every channel with abs(error) > tolerance in a single pass over caldata,
+    for all devices and the dates between settings.scanFrom and settings.scanTo
+    Returns the scan statistics and the out of spec ranges ordered by device, date, channel, range and measurement
+    '''
+    start = time.perf_counter()
+    rowsDecoded = source.backend.rowsDecoded
+
+    # The limits are handed to the backend, so indexed sources only read the rows between them
+    dateRange = None
+    if settings.scanFrom is not None or settings.scanTo is not None:
+        dateRange = (settings.scanFrom if settings.scanFrom is not None else datetime.date.min, settings.scanTo if settings.scanTo is not None else datetime.date.max)
     # end if
-    indicatorString = ''.join(indicator)
-    print(Fore.BLUE + label + '  ' + str(percentage) + '%  ' + Style.RESET_ALL + Fore.GREEN + indicatorString + Style.RESET_ALL, end= ('\r' if not reset else '\n'))
+
+    # Like the reports, only the first row of a measurement counts
+    # The measurements seen for a date and channel are kept as a bit mask
+    seen = {}
+    channels = {}
+    outOfSpec = {}
+    rowsMatched = 0
+    for rowDate, channelId, entryNumber, rangeName, refValue, measValue, error, tolerance in source.streamCalData(None, None, dateRange):
+        # Channel IDs look like '724 CH05 CTS', anything else is not a CTS channel
+        deviceId, separator, channelPart = channelId.partition(' CH')
+        if not deviceId.isdigit() or not channelPart[:2].isdigit():
+            continue
+        # end if
+        deviceId = int(deviceId)
+        channelNumber = int(channelPart[:2])
+        # Entries 1 - 21 belong to even channels, 22 - 42 to odd channels (see extractChannel)
+        if (channelNumber % 2 == 0 and not (entryNumber >= 1 and entryNumber <= 21)) or (channelNumber % 2 == 1 and not (entryNumber >= 22 and entryNumber <= 42)):
+            continue
+        # end if
+        preMeasurement = rangeName.startswith('PRE')
+        bit = 1 << (entryNumber * 2 + (1 if preMeasurement else 0))
+        key = (rowDate, channelId)
+        mask = seen.get(key, 0)
+        if mask & bit:
+            continue
+        # end if
+        seen[key] = mask | bit
+        channels[(deviceId, rowDate, channelNumber)] = True
+        rowsMatched = rowsMatched + 1
+
+        if abs(error) > tolerance:
+            entryNumber = entryNumber if entryNumber < 22 else entryNumber - 21
+            rangeKey = (deviceId, rowDate, channelNumber, rangeOfEntry(entryNumber), 'PRE' if preMeasurement else 'POST')
+            quality = abs(error) / tolerance * 100 if tolerance > 0 else None
+            entries, worstQuality = outOfSpec.get(rangeKey, ([], None))
+            entries.append(entryNumber)
+            if worstQuality is None or (quality is not None and quality > worstQuality):
+                worstQuality = quality
+            # end if
+            outOfSpec[rangeKey] = (entries, worstQuality)
+        # end if
+    # end for
+    profiler.addStage('scan caldata', time.perf_counter() - start, source.backend.rowsDecoded - rowsDecoded, rowsMatched)
+
+    statistics = {'devices': len(set(key[0] for key in channels)),
+                  'calibrations': len(set(key[:2] for key in channels)),
+                  'channels': len(channels),
+                  'measurements': rowsMatched,
+                  'outOfSpecChannels': len(set(key[:3] for key in outOfSpec))}
+    ranges = []
+    for rangeKey in sorted(outOfSpec):
+        entries, worstQuality = outOfSpec[rangeKey]
+        ranges.append(rangeKey + (sorted(entries), worstQuality))
+    # end for
+
+    return statistics, ranges
 # end def
 
-def readCalibrationData(settings, cts):
-    # cts.readChannel(0)
-    # return
+def writeScanCsv(fileName, ranges):
+    import csv
+    with open(fileName, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(SCAN_COLUMNS)
+        for device, calDate, channelNumber, rangeName, measurement, entries, worstQuality in ranges:
+            writer.writerow((device, calDate.isoformat(), channelNumber, rangeName, measurement, ' '.join(str(entry) for entry in entries),
+                             '{:.1f}'.format(worstQuality) if worstQuality is not None else ''))
+        # end for
+    # end with
+# end def
 
-    # Prepare progress bar
-    progress = 0.0
-    pInc = 100 / settings.numChannels
-    progressLabel = 'Reading caldata.DB and channel.DB...'
-    print('\n\n')
-    printProgressBar(int(progress), progressLabel, False)
+def writeScanJson(settings, fileName, statistics, ranges):
+    import json
+    result = {'from': settings.scanFrom.isoformat() if settings.scanFrom is not None else None,
+              'to': settings.scanTo.isoformat() if settings.scanTo is not None else None}
+    result.update(statistics)
+    result['outOfSpec'] = [dict(zip(SCAN_COLUMNS, (device, calDate.isoformat(), channelNumber, rangeName, measurement, entries,
+                                                   round(worstQuality, 1) if worstQuality is not None else None)))
+                           for device, calDate, channelNumber, rangeName, measurement, entries, worstQuality in ranges]
+    with open(fileName, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    # end with
+# end def
 
-    for channel in range(0, settings.numChannels):
-        cts.readChannel(channel)
-        progress = progress + pInc
-        printProgressBar(int(progress), progressLabel, False)
-    # end for
+def generateScan(settings):
+    source = CalDataSource(openDataBackend(settings))
+    statistics, ranges = scanCalData(settings, source)
+    source.backend.close()
 
-    # Print final progress bar
-    printProgressBar(int(progress), progressLabel, True)
+    try:
+        for scanFile in settings.scanFiles:
+            if os.path.splitext(scanFile)[1].lower() == '.csv':
+                writeScanCsv(scanFile, ranges)
+            else:
+                writeScanJson(settings, scanFile, statistics, ranges)
+            # end if
+            colored_print(Fore.GREEN + '\nScan "' + scanFile + '" created sucessfully!')
+        # end for
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + str(error))
+         sys.exit(1)
+    # end exception
+
+    print(str(statistics['devices']) + ' devices, ' + str(statistics['calibrations']) + ' calibrations, ' + str(statistics['channels']) + ' channels scanned')
+    colored_print((Fore.RED if statistics['outOfSpecChannels'] > 0 else Fore.GREEN) + str(statistics['outOfSpecChannels']) + ' channels out of spec')
 # end def
 
 
 ###############################################################################
-# Writing output file
+# Factor diff
 ###############################################################################
 
-def sanitizeTypst(string):
-    # Escape typst control characters
-    res = string.replace('#', '\\#')
-    res = res.replace('@', '\\@')
-    res = res.replace('$', '\\$')
-    return res
+# Columns of a factor diff file, one row per changed range of a channel
+FACTOR_DIFF_COLUMNS = ('Id', 'Status', 'Range', 'FactorOld', 'FactorNew', 'FactorDelta', 'OffsetOld', 'OffsetNew', 'OffsetDelta')
+
+def openChannelSnapshot(fileName):
+    # A channel.DB, the SQLite database of --convert or --cache, or a Parquet directory of --convert
+    if os.path.isdir(fileName):
+        return ParquetBackend(fileName)
+    elif fileName.lower().endswith('.sqlite'):
+        return SQLiteBackend(fileName)
+    # end if
+    return ParadoxBackend(None, fileName)
 # end def
 
-def readTemplate(settings):
-    f = open(settings.template, 'r', encoding='utf-8')
-    lines = f.readlines()
-    f.close()
+def channelSortKey(channelId):
+    # Devices in numeric order, '9 CH00 CTS' before '10 CH00 CTS'
+    deviceId = channelId.partition(' ')[0]
+    return (0, int(deviceId), channelId) if deviceId.isdigit() else (1, 0, channelId)
+# end def
+
+def diffChannelFactors(oldFactors, newFactors):
+    '''
+    Compare two channel factor indexes (see CalDataSource.indexChannelFile) range by range
+    Returns the statistics and a row of FACTOR_DIFF_COLUMNS for every range that changed, was added or removed
+    '''
+    statistics = {'channels': 0, 'changed': 0, 'added': 0, 'removed': 0}
+    rows = []
+    for channelId in sorted(set(oldFactors) | set(newFactors), key=channelSortKey):
+        statistics['channels'] = statistics['channels'] + 1
+        old = oldFactors.get(channelId)
+        new = newFactors.get(channelId)
+        status = 'ADDED' if old is None else ('REMOVED' if new is None else 'CHANGED')
+        numRows = len(rows)
+        for rangeName, factorColumn, offsetColumn in CHANNEL_FACTOR_RANGES:
+            factorOld = old[factorColumn] if old is not None else None
+            factorNew = new[factorColumn] if new is not None else None
+            offsetOld = old[offsetColumn] if old is not None else None
+            offsetNew = new[offsetColumn] if new is not None else None
+            if status == 'CHANGED' and factorOld == factorNew and offsetOld == offsetNew:
+                continue
+            # end if
+            rows.append((channelId, status, rangeName, factorOld, factorNew, factorNew - factorOld if status == 'CHANGED' else None,
+                         offsetOld, offsetNew, offsetNew - offsetOld if status == 'CHANGED' else None))
+        # end for
+        if len(rows) > numRows:
+            statistics[status.lower()] = statistics[status.lower()] + 1
+        # end if
+    # end for
 
-    return lines
+    return statistics, rows
 # end def
 
-def writeParameters(settings, cts, f):    
-    f.write('#let signer_name = [' + sanitizeTypst(settings.approvedByName) + ']\n')
-    f.write('#let signer_title = [' + sanitizeTypst(settings.approvedByTitle) + ']\n')
+def writeFactorDiffCsv(fileName, rows):
+    import csv
+    with open(fileName, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FACTOR_DIFF_COLUMNS)
+        writer.writerows(rows)
+    # end with
+# end def
 
-    f.write('#let calibrated_by = [' + sanitizeTypst(settings.calByName) + ']\n')
-    f.write('#let calibrated_by_title = [' + sanitizeTypst(settings.calByTitle) + ']\n')
+def writeFactorDiffJson(settings, fileName, statistics, rows):
+    import json
+    result = {'old': settings.factorDiff[0], 'new': settings.factorDiff[1]}
+    result.update(statistics)
+    result['changes'] = [dict(zip(FACTOR_DIFF_COLUMNS, row)) for row in rows]
+    with open(fileName, 'w', encoding='utf-8') as f:
+        json.dump(result, f, indent=2)
+    # end with
+# end def
 
-    f.write('#let report_number = [' + sanitizeTypst(settings.reportNumber) + ']\n')
+def printFactorDiff(rows):
+    print('\n{:<16}{:<9}{:<7}{:>24}{:>24}{:>24}{:>24}'.format('Id', 'Status', 'Range', 'Factor old', 'Factor delta', 'Offset old', 'Offset delta'))
+    for channelId, status, rangeName, factorOld, factorNew, factorDelta, offsetOld, offsetNew, offsetDelta in rows:
+        values = []
+        for value in (factorOld if factorOld is not None else factorNew, factorDelta, offsetOld if offsetOld is not None else offsetNew, offsetDelta):
+            values.append('{:.15g}'.format(value) if value is not None else '--')
+        # end for
+        print('{:<16}{:<9}{:<7}{:>24}{:>24}{:>24}{:>24}'.format(channelId, status, rangeName, *values))
+    # end for
+# end def
 
-    f.write('#let submitter_company = [' + sanitizeTypst(settings.clientName) + ']\n')
-    f.write('#let submitter_company_address = [' + sanitizeTypst(settings.clientAddress1) + '\\ ' + sanitizeTypst(settings.clientAddress2) + '\\ ' + sanitizeTypst(settings.clientAddress3) + ']\n')
+def generateFactorDiff(settings):
+    # Every channel file is read and indexed in one pass
+    try:
+        indexes = []
+        for fileName in settings.factorDiff:
+            source = CalDataSource(openChannelSnapshot(fileName))
+            try:
+                source.indexChannelFile()
+            except KeyError as error:
+                raise ValueError('Column ' + str(error.args[0]) + ' missing in ' + fileName)
+            # end exception
+            source.backend.close()
+            indexes.append(source.channelFactors)
+        # end for
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + str(error))
+         sys.exit(1)
+    # end exception
 
-    f.write('#let tester_model = [CTS ' + str(settings.numChannels) + ' channel]\n')
-    f.write('#let tester_serial = [' + settings.serialNumber + ']\n')
-    f.write('#let tester_id = [' + str(settings.deviceId) + ']\n')
+    start = time.perf_counter()
+    statistics, rows = diffChannelFactors(indexes[0], indexes[1])
+    profiler.addStage('diff factors', time.perf_counter() - start, 0, len(rows))
 
-    f.write('#let date_received = [' + settings.receivedDate.strftime('%d/%m/%Y') + ']\n')
-    f.write('#let date_calibrated = [' + settings.calDate.strftime('%d/%m/%Y') + ']\n')
-    f.write('#let date_recommended = [' + settings.recommendedNextCal.strftime('%d/%m/%Y') + ']\n')
+    if settings.diffFiles is None:
+        printFactorDiff(rows)
+    # end if
+    try:
+        for diffFile in settings.diffFiles or []:
+            if os.path.splitext(diffFile)[1].lower() == '.csv':
+                writeFactorDiffCsv(diffFile, rows)
+            else:
+                writeFactorDiffJson(settings, diffFile, statistics, rows)
+            # end if
+            colored_print(Fore.GREEN + '\nFactor diff "' + diffFile + '" created sucessfully!')
+        # end for
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + str(error))
+         sys.exit(1)
+    # end exception
 
-    f.write('#let calibration_sop = [' + sanitizeTypst(SOP_NAME) + ']\n')
-    f.write('#let calibration_sop_date = [' + sanitizeTypst(SOP_DATE) + ']\n')
-    f.write('#let software_version = [' + sanitizeTypst(SOFTWARE_VERSION) + ']\n')
+    print('\n' + str(statistics['channels']) + ' channels compared, ' + str(statistics['changed']) + ' changed, ' + str(statistics['added']) + ' added, ' + str(statistics['removed']) + ' removed')
+# end def
 
-    f.write('#let multimeter_due = [' + settings.calDateMultimeter.strftime('%d/%m/%Y') + ']\n')
-    f.write('#let multimeter_report = [' + sanitizeTypst(settings.calReportMultimeter) + ']\n')
-    f.write('#let calibrator_due = [' + settings.calDateCalibrator.strftime('%d/%m/%Y') + ']\n')
-    f.write('#let calibrator_report = [' + sanitizeTypst(settings.calReportCalibrator) + ']\n')
 
-    # Determine if any parameter was out of specification
-    preOutOfSpec = ''
-    postOutOfSpec = ''
-    for key, channel in cts.channels.items():
-        if len(channel.preOutOfSpec) > 0:
-            preOutOfSpecRange = None
-            if len(preOutOfSpec) > 0:
-                preOutOfSpec = preOutOfSpec + '; '
-            # end if
-            for rangeOOS in channel.preOutOfSpec:
-                preOutOfSpecRange = (preOutOfSpecRange + '; ' + rangeOOS if preOutOfSpecRange is not None else rangeOOS) 
-            # end for
-            preOutOfSpec = preOutOfSpec + 'CH' + ('0' if channel.channelNumber < 10 else '') + str(channel.channelNumber) + ' (' + preOutOfSpecRange + ')'
-        # end if
+###############################################################################
+# Batch processing
+###############################################################################
 
-        if len(channel.postOutOfSpec) > 0:
-            postOutOfSpecRange = None
-            if len(postOutOfSpec) > 0:
-                postOutOfSpec = postOutOfSpec + '; '
-            # end if
-            for rangeOOS in channel.postOutOfSpec:
-                postOutOfSpecRange = (postOutOfSpecRange + '; ' + rangeOOS if postOutOfSpecRange is not None else rangeOOS) 
-            # end for
-            postOutOfSpec = postOutOfSpec + 'CH' + ('0' if channel.channelNumber < 10 else '') + str(channel.channelNumber) + ' (' + postOutOfSpecRange + ')'
+def readManifest(settings):
+    '''
+    Read the batch manifest and create the settings of every report in it
+    '''
+    import csv
+    f = open(settings.batchFile, 'r', encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(f)
+    for column in MANIFEST_COLUMNS:
+        if reader.fieldnames is None or column not in reader.fieldnames:
+            f.close()
+            raise ValueError('Column missing in manifest ' + settings.batchFile + ': ' + column)
         # end if
     # end for
-    f.write('#let condition_received_tolerance = [' + ('YES' if len(preOutOfSpec) == 0 else 'NO') + ']\n')
-    f.write('#let condition_received_remark = [' + ('N/A' if len(preOutOfSpec) == 0 else preOutOfSpec ) +']\n')
-    f.write('#let condition_shipped_tolerance = [' + ('YES' if len(postOutOfSpec) == 0 else 'NO') + ']\n')
-    f.write('#let condition_shipped_remark = [' + ('N/A' if len(postOutOfSpec) == 0 else postOutOfSpec ) +']\n')
-    f.write('\n')
-# end def
 
-def writeChannelArrays(settings, cts, f):
-    for key, channel in cts.channels.items():
-        f.write('#let array' + str(channel.channelNumber) + ' = (\n')
-
-        # I1
-        formatter = '"{:7.6f} mA",\n'
-        # deviation = '"{:.4e} mA",\n'
-        deviation = '"{:.6f} mA",\n'
-        f.write(formatter.format(channel.records[101].refValue))   # "af I1 -90 av", 
-        f.write(formatter.format(channel.records[101].measValue))  # "af I1 -90 mv",
-        f.write(deviation.format(channel.records[101].error))      # "af I1 -90 dv",
-        f.write(formatter.format(channel.records[1].refValue))     # "al I1 -90 av",
-        f.write(formatter.format(channel.records[1].measValue))    # "al I1 -90 mv",
-        f.write(deviation.format(channel.records[1].error))        # "al I1 -90 dv",
-        f.write(formatter.format(channel.records[1].uncertainty))  # "I1 -90 uc",
-
-        f.write(formatter.format(channel.records[102].refValue))   # "af I1 -10 av", 
-        f.write(formatter.format(channel.records[102].measValue))  # "af I1 -10 mv",
-        f.write(deviation.format(channel.records[102].error))      # "af I1 -10 dv",
-        f.write(formatter.format(channel.records[2].refValue))     # "al I1 -10 av",
-        f.write(formatter.format(channel.records[2].measValue))    # "al I1 -10 mv",
-        f.write(deviation.format(channel.records[2].error))        # "al I1 -10 dv",
-        f.write(formatter.format(channel.records[2].uncertainty))  # "I1 -10 uc",
-
-        f.write(formatter.format(channel.records[103].refValue))   # "af I1 10 av", 
-        f.write(formatter.format(channel.records[103].measValue))  # "af I1 10 mv",
-        f.write(deviation.format(channel.records[103].error))      # "af I1 10 dv",
-        f.write(formatter.format(channel.records[3].refValue))     # "al I1 10 av",
-        f.write(formatter.format(channel.records[3].measValue))    # "al I1 10 mv",
-        f.write(deviation.format(channel.records[3].error))        # "al I1 10 dv",
-        f.write(formatter.format(channel.records[3].uncertainty))  # "I1 10 uc",
-
-        f.write(formatter.format(channel.records[104].refValue))   # "af I1 90 av", 
-        f.write(formatter.format(channel.records[104].measValue))  # "af I1 90 mv",
-        f.write(deviation.format(channel.records[104].error))      # "af I1 90 dv",
-        f.write(formatter.format(channel.records[4].refValue))     # "al I1 90 av",
-        f.write(formatter.format(channel.records[4].measValue))    # "al I1 90 mv",
-        f.write(deviation.format(channel.records[4].error))        # "al I1 90 dv",
-        f.write(formatter.format(channel.records[4].uncertainty))  # "I1 90 uc",
-
-        # I2
-        formatter = '"{:7.5f} mA",\n'
-        # deviation = '"{:.4e} mA",\n'
-        deviation = '"{:.6f} mA",\n'
-        f.write(formatter.format(channel.records[105].refValue))   # "af I2 -90 av", 
-        f.write(formatter.format(channel.records[105].measValue))  # "af I2 -90 mv",
-        f.write(deviation.format(channel.records[105].error))      # "af I2 -90 dv",
-        f.write(formatter.format(channel.records[5].refValue))     # "al I2 -90 av",
-        f.write(formatter.format(channel.records[5].measValue))    # "al I2 -90 mv",
-        f.write(deviation.format(channel.records[5].error))        # "al I2 -90 dv",
-        f.write(formatter.format(channel.records[5].uncertainty))  # "I2 -90 uc",
-
-        formatter = '"{:7.6f} mA",\n'
-        f.write(formatter.format(channel.records[106].refValue))   # "af I2 -10 av", 
-        f.write(formatter.format(channel.records[106].measValue))  # "af I2 -10 mv",
-        f.write(deviation.format(channel.records[106].error))      # "af I2 -10 dv",
-        f.write(formatter.format(channel.records[6].refValue))     # "al I2 -10 av",
-        f.write(formatter.format(channel.records[6].measValue))    # "al I2 -10 mv",
-        f.write(deviation.format(channel.records[6].error))        # "al I2 -10 dv",
-        f.write(formatter.format(channel.records[6].uncertainty))  # "I2 -10 uc",
-
-        f.write(formatter.format(channel.records[107].refValue))   # "af I2 10 av", 
-        f.write(formatter.format(channel.records[107].measValue))  # "af I2 10 mv",
-        f.write(deviation.format(channel.records[107].error))      # "af I2 10 dv",
-        f.write(formatter.format(channel.records[7].refValue))     # "al I2 10 av",
-        f.write(formatter.format(channel.records[7].measValue))    # "al I2 10 mv",
-        f.write(deviation.format(channel.records[7].error))        # "al I2 10 dv",
-        f.write(formatter.format(channel.records[7].uncertainty))  # "I2 10 uc",
-
-        formatter = '"{:7.5f} mA",\n'
-        f.write(formatter.format(channel.records[108].refValue))   # "af I2 90 av", 
-        f.write(formatter.format(channel.records[108].measValue))  # "af I2 90 mv",
-        f.write(deviation.format(channel.records[108].error))      # "af I2 90 dv",
-        f.write(formatter.format(channel.records[8].refValue))     # "al I2 90 av",
-        f.write(formatter.format(channel.records[8].measValue))    # "al I2 90 mv",
-        f.write(deviation.format(channel.records[8].error))        # "al I2 90 dv",
-        f.write(formatter.format(channel.records[8].uncertainty))  # "I2 90 uc",
-
-        # I3
-        formatter = '"{:7.6f} A",\n'
-        # deviation = '"{:.4e} A",\n'
-        deviation = '"{:.6f} A",\n'
-        f.write(formatter.format(channel.records[109].refValue))   # "af I3 -90 av", 
-        f.write(formatter.format(channel.records[109].measValue))  # "af I3 -90 mv",
-        f.write(deviation.format(channel.records[109].error))      # "af I3 -90 dv",
-        f.write(formatter.format(channel.records[9].refValue))     # "al I3 -90 av",
-        f.write(formatter.format(channel.records[9].measValue))    # "al I3 -90 mv",
-        f.write(deviation.format(channel.records[9].error))        # "al I3 -90 dv",
-        f.write(formatter.format(channel.records[9].uncertainty))  # "I3 -90 uc",
-
-        formatter = '"{:7.5f} mA",\n'
-        # deviation = '"{:.4e} mA",\n'
-        deviation = '"{:.6f} mA",\n'
-        f.write(formatter.format(channel.records[110].refValue))   # "af I3 -10 av", 
-        f.write(formatter.format(channel.records[110].measValue))  # "af I3 -10 mv",
-        f.write(deviation.format(channel.records[110].error))      # "af I3 -10 dv",
-        f.write(formatter.format(channel.records[10].refValue))     # "al I3 -10 av",
-        f.write(formatter.format(channel.records[10].measValue))    # "al I3 -10 mv",
-        f.write(deviation.format(channel.records[10].error))        # "al I3 -10 dv",
-        f.write(formatter.format(channel.records[10].uncertainty))  # "I3 -10 uc",
-
-        f.write(formatter.format(channel.records[111].refValue))   # "af I3 10 av", 
-        f.write(formatter.format(channel.records[111].measValue))  # "af I3 10 mv",
-        f.write(deviation.format(channel.records[111].error))      # "af I3 10 dv",
-        f.write(formatter.format(channel.records[11].refValue))     # "al I3 10 av",
-        f.write(formatter.format(channel.records[11].measValue))    # "al I3 10 mv",
-        f.write(deviation.format(channel.records[11].error))        # "al I3 10 dv",
-        f.write(formatter.format(channel.records[11].uncertainty))  # "I3 10 uc",
-
-        formatter = '"{:7.6f} A",\n'
-        # deviation = '"{:.4e} A",\n'
-        deviation = '"{:.6f} A",\n'
-        f.write(formatter.format(channel.records[112].refValue))   # "af I3 90 av", 
-        f.write(formatter.format(channel.records[112].measValue))  # "af I3 90 mv",
-        f.write(deviation.format(channel.records[112].error))      # "af I3 90 dv",
-        f.write(formatter.format(channel.records[12].refValue))     # "al I3 90 av",
-        f.write(formatter.format(channel.records[12].measValue))    # "al I3 90 mv",
-        f.write(deviation.format(channel.records[12].error))        # "al I3 90 dv",
-        f.write(formatter.format(channel.records[12].uncertainty))  # "I3 90 uc",
-
-        # I4
-        formatter = '"{:7.6f} A",\n'
-        # deviation = '"{:.4e} A",\n'
-        deviation = '"{:.6f} A",\n'
-        f.write(formatter.format(channel.records[113].refValue))   # "af I4 -90 av", 
-        f.write(formatter.format(channel.records[113].measValue))  # "af I4 -90 mv",
-        f.write(deviation.format(channel.records[113].error))      # "af I4 -90 dv",
-        f.write(formatter.format(channel.records[13].refValue))     # "al I4 -90 av",
-        f.write(formatter.format(channel.records[13].measValue))    # "al I4 -90 mv",
-        f.write(deviation.format(channel.records[13].error))        # "al I4 -90 dv",
-        f.write(formatter.format(channel.records[13].uncertainty))  # "I4 -90 uc",
-
-        f.write(formatter.format(channel.records[114].refValue))   # "af I4 -10 av", 
-        f.write(formatter.format(channel.records[114].measValue))  # "af I4 -10 mv",
-        f.write(deviation.format(channel.records[114].error))      # "af I4 -10 dv",
-        f.write(formatter.format(channel.records[14].refValue))     # "al I4 -10 av",
-        f.write(formatter.format(channel.records[14].measValue))    # "al I4 -10 mv",
-        f.write(deviation.format(channel.records[14].error))        # "al I4 -10 dv",
-        f.write(formatter.format(channel.records[14].uncertainty))  # "I4 -10 uc",
-
-        f.write(formatter.format(channel.records[115].refValue))   # "af I4 10 av", 
-        f.write(formatter.format(channel.records[115].measValue))  # "af I4 10 mv",
-        f.write(deviation.format(channel.records[115].error))      # "af I4 10 dv",
-        f.write(formatter.format(channel.records[15].refValue))     # "al I4 10 av",
-        f.write(formatter.format(channel.records[15].measValue))    # "al I4 10 mv",
-        f.write(deviation.format(channel.records[15].error))        # "al I4 10 dv",
-        f.write(formatter.format(channel.records[15].uncertainty))  # "I4 10 uc",
-
-        f.write(formatter.format(channel.records[116].refValue))   # "af I4 90 av", 
-        f.write(formatter.format(channel.records[116].measValue))  # "af I4 90 mv",
-        f.write(deviation.format(channel.records[116].error))      # "af I4 90 dv",
-        f.write(formatter.format(channel.records[16].refValue))     # "al I4 90 av",
-        f.write(formatter.format(channel.records[16].measValue))    # "al I4 90 mv",
-        f.write(deviation.format(channel.records[16].error))        # "al I4 90 dv",
-        f.write(formatter.format(channel.records[16].uncertainty))  # "I4 90 uc",
-
-        # U
-        formatter = '"{:7.6f} V",\n'
-        # deviation = '"{:.4e} V",\n'
-        deviation = '"{:.6f} V",\n'
-        f.write(formatter.format(channel.records[117].refValue))   # "af U 10 av", 
-        f.write(formatter.format(channel.records[117].measValue))  # "af U 10 mv",
-        f.write(deviation.format(channel.records[117].error))      # "af U 10 dv",
-        f.write(formatter.format(channel.records[17].refValue))     # "al U 10 av",
-        f.write(formatter.format(channel.records[17].measValue))    # "al U 10 mv",
-        f.write(deviation.format(channel.records[17].error))        # "al U 10 dv",
-        f.write(formatter.format(channel.records[17].uncertainty))  # "U 10 uc",
-
-        f.write(formatter.format(channel.records[118].refValue))   # "af U 50 av", 
-        f.write(formatter.format(channel.records[118].measValue))  # "af U 50 mv",
-        f.write(deviation.format(channel.records[118].error))      # "af U 50 dv",
-        f.write(formatter.format(channel.records[18].refValue))     # "al U 50 av",
-        f.write(formatter.format(channel.records[18].measValue))    # "al U 50 mv",
-        f.write(deviation.format(channel.records[18].error))        # "al U 50 dv",
-        f.write(formatter.format(channel.records[18].uncertainty))  # "U 50 uc",
-
-        f.write(formatter.format(channel.records[119].refValue))   # "af U 90 av", 
-        f.write(formatter.format(channel.records[119].measValue))  # "af U 90 mv",
-        f.write(deviation.format(channel.records[119].error))      # "af U 90 dv",
-        f.write(formatter.format(channel.records[19].refValue))     # "al U 90 av",
-        f.write(formatter.format(channel.records[19].measValue))    # "al U 90 mv",
-        f.write(deviation.format(channel.records[19].error))        # "al U 90 dv",
-        f.write(formatter.format(channel.records[19].uncertainty))  # "U 90 uc",
-
-        # T
-        formatter = '"{:5.3f} °C",\n'
-        deviation = '"{:.4f} V",\n'
-        f.write(formatter.format(channel.records[120].refValue))   # "af T r1 av", 
-        f.write(formatter.format(channel.records[120].measValue))  # "af T r1 mv",
-        f.write(deviation.format(channel.records[120].error))      # "af T r1 dv",
-        f.write(formatter.format(channel.records[20].refValue))     # "al T r1 av",
-        f.write(formatter.format(channel.records[20].measValue))    # "al T r1 mv",
-        f.write(formatter.format(channel.records[20].error))        # "al T r1 dv",
-        f.write(formatter.format(channel.records[20].uncertainty))  # "T r1 uc",
-
-        f.write(formatter.format(channel.records[121].refValue))   # "af T r2 av", 
-        f.write(formatter.format(channel.records[121].measValue))  # "af T r2 mv",
-        f.write(deviation.format(channel.records[121].error))      # "af T r2 dv",
-        f.write(formatter.format(channel.records[21].refValue))     # "al T r2 av",
-        f.write(formatter.format(channel.records[21].measValue))    # "al T r2 mv",
-        f.write(formatter.format(channel.records[21].error))        # "al T r2 dv",
-        f.write(formatter.format(channel.records[21].uncertainty))  # "T r2 uc",
-
-        # Factors
-        formatter = '"{:19.18f}"'
-        f.write(formatter.format(channel.factors['I1']['factor']) + ', ' + formatter.format(channel.factors['I1']['offset']) + ',\n')   # "I1 factor", "I1 offset", 
-        f.write(formatter.format(channel.factors['I2']['factor']) + ', ' + formatter.format(channel.factors['I2']['offset']) + ',\n')   # "I1 factor", "I1 offset", 
-        f.write(formatter.format(channel.factors['I3']['factor']) + ', ' + formatter.format(channel.factors['I3']['offset']) + ',\n')   # "I1 factor", "I1 offset", 
-        f.write(formatter.format(channel.factors['I4']['factor']) + ', ' + formatter.format(channel.factors['I4']['offset']) + ',\n')   # "I1 factor", "I1 offset", 
-        f.write(formatter.format(channel.factors['U']['factor']) + ', ' + formatter.format(channel.factors['U']['offset']) + ',\n')     # "U factor", "U offset", 
-        formatter = '"{:6.5f}"'
-        f.write(formatter.format(channel.factors['T']['factor']) + ', ' + formatter.format(channel.factors['T']['offset']) + ',\n')     # "T factor", "T offset", 
-
-        f.write(')\n\n')
+    reports = []
+    for row in reader:
+        reportSettings = copy.copy(settings)
+        try:
+            reportSettings.fromManifestRow(row)
+        except Exception as error:
+            f.close()
+            raise ValueError('Invalid manifest row ' + str(reader.line_num) + ': ' + str(error))
+        # end exception
+        reportSettings.setOutputFile()
+        reports.append(reportSettings)
     # end for
+    f.close()
+
+    return reports
 # end def
 
+def generateBatch(settings):
+    # Returns False if a PDF could not be compiled
+    try:
+        reports = readManifest(settings)
+    except Exception as error:
+         colored_print(Fore.RED + 'ERROR: ' + error.args[0])
+         sys.exit(1)
+    # end exception
 
-def writeChannelFunctions(cts, f):
-    for key, channel in cts.channels.items():
-        f.write('#makechannel(' + str(channel.channelNumber) + ', array' + str(channel.channelNumber) + (', lastChannel: true' if cts.numChannels == (channel.channelNumber + 1) else '')+ ')\n')
+    # Open the Paradox tables and index them once for all reports
+    source = CalDataSource(openDataBackend(settings))
+    source.indexCalData(set(report.calDate for report in reports), set(report.deviceId for report in reports))
+    source.indexChannelFile()
+    template = readTemplate(settings)
+
+    pdfFiles = []
+    numSkipped = 0
+    for reportSettings in reports:
+        if settings.verbose:
+            colored_print(Fore.BLUE + '\n\nSettings:')
+            print(reportSettings)
+        # end if
+
+        cts = CTS(reportSettings, source)
+        writer = ReportWriter(reportSettings)
+        readCalibrationData(reportSettings, cts, writer)
+        if writeData(reportSettings, cts, template, writer):
+            colored_print(Fore.GREEN + '\nReport "' + reportSettings.outputFile + '" created sucessfully!')
+        else:
+            numSkipped = numSkipped + 1
+            colored_print(Fore.BLUE + '\nReport "' + reportSettings.outputFile + '" unchanged, skipped')
+        # end if
+        if settings.pdf and not pdfIsCurrent(reportSettings.outputFile):
+            pdfFiles.append(reportSettings.outputFile)
+        # end if
     # end for
+
+    colored_print(Fore.GREEN + '\n' + str(len(reports) - numSkipped) + ' reports created sucessfully!' + ((' ' + str(numSkipped) + ' unchanged reports skipped.') if numSkipped > 0 else ''))
+
+    if len(pdfFiles) > 0:
+        return compileReports(settings, pdfFiles)
+    # end if
+    return True
 # end def
 
-def writeData(settings, cts, template):
-    f = open(settings.outputFile, 'w', encoding='utf-8')
 
-    # Write parameters into output file
-    writeParameters(settings, cts, f)
+###############################################################################
+# Report server
+###############################################################################
 
-    # Write channel data into output file
-    writeChannelArrays(settings, cts, f)
+class ReportServer:
+    # Keeps equipment data, template and indexed Paradox data in memory between requests
+    def __init__(self, settings):
+        self.settings = settings
+        self.source = None
+        self.loadedAt = None
+        self.load()
+    # end def
 
-    # Write the actual template into the output file
-    for line in template:
-        f.write(line)
-    # end for
+    def load(self):
+        self.settings.getCalEquipmentFromFile()
+        readTemplate(self.settings)
+        if self.source is not None:
+            self.source.backend.close()
+        # end if
+        self.source = CalDataSource(openDataBackend(self.settings))
+        if not self.source.backend.hasIndex:
+            # Without an indexed backend, all of caldata.DB is indexed once, otherwise every request queries the backend
+            self.source.indexCalData(None, None)
+        # end if
+        self.source.indexChannelFile()
+        self.loadedAt = datetime.datetime.now()
+    # end def
+
+    def status(self):
+        return {'version': VERSION,
+                'loaded': self.loadedAt.isoformat(timespec='seconds'),
+                'caldata': self.settings.calData,
+                'channelfile': self.settings.channelFile,
+                'source': self.settings.dataSource,
+                'cache': self.settings.cacheDir}
+    # end def
 
-    # Write the function calls to create the channel table at the end of the template
-    writeChannelFunctions(cts, f)
+    def createReport(self, parameters):
+        # Parameters use the batch manifest columns, optional Format is typ or pdf
+        row = {}
+        for key, value in parameters.items():
+            row[key] = str(value) if value is not None else ''
+        # end for
 
-    f.close()
+        reportSettings = copy.copy(self.settings)
+        reportSettings.fromManifestRow(row)
+        reportSettings.setOutputFile()
+        if self.source.backend.hasIndex:
+            self.source.indexCalData([reportSettings.calDate], [reportSettings.deviceId])
+        # end if
+
+        cts = CTS(reportSettings, self.source)
+        writer = ReportWriter(reportSettings)
+        readCalibrationData(reportSettings, cts, writer)
+        writeData(reportSettings, cts, readTemplate(reportSettings), writer)
+
+        outputFormat = row.get('Format', 'pdf' if self.settings.pdf else 'typ')
+        if outputFormat == 'pdf':
+            if pdfIsCurrent(reportSettings.outputFile):
+                return os.path.splitext(reportSettings.outputFile)[0] + '.pdf'
+            # end if
+            if reportSettings.typstCompiler is None:
+                reportSettings.typstCompiler = findTypstCompiler()
+                self.settings.typstCompiler = reportSettings.typstCompiler
+            # end if
+            pdfFile, seconds = compilePdf(reportSettings, reportSettings.outputFile)
+            return pdfFile
+        elif outputFormat != 'typ':
+            raise ValueError('Unknown format: ' + outputFormat)
+        # end if
+        return reportSettings.outputFile
+    # end def
+# end class
+
+
+def createRequestHandler():
+    # http.server is only imported for --serve
+    from http.server import BaseHTTPRequestHandler
+    import json
+
+    class ReportRequestHandler(BaseHTTPRequestHandler):
+        def sendJson(self, status, data):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        # end def
+
+        def sendFile(self, fileName):
+            f = open(fileName, 'rb')
+            body = f.read()
+            f.close()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/pdf' if fileName.endswith('.pdf') else 'text/plain; charset=utf-8')
+            self.send_header('Content-Disposition', 'attachment; filename="' + os.path.basename(fileName).replace('"', '') + '"')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        # end def
+
+        def do_GET(self):
+            if self.path == '/':
+                self.sendJson(200, self.server.reportServer.status())
+            else:
+                self.sendJson(404, {'error': 'Not found: ' + self.path})
+            # end if
+        # end def
+
+        def do_POST(self):
+            try:
+                if self.path == '/report':
+                    # Only JSON is accepted, a plain form or text post from another web page is refused
+                    contentType = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                    if contentType != 'application/json':
+                        self.sendJson(415, {'error': 'Content-Type has to be application/json'})
+                        return
+                    # end if
+                    length = int(self.headers.get('Content-Length', '0'))
+                    parameters = json.loads(self.rfile.read(length).decode('utf-8'))
+                    if not isinstance(parameters, dict):
+                        raise ValueError('Request body has to be a JSON object')
+                    # end if
+                    missing = [key for key in MANIFEST_COLUMNS if key not in parameters]
+                    if len(missing) > 0:
+                        self.sendJson(400, {'error': 'Missing parameter: ' + ', '.join(missing)})
+                        return
+                    # end if
+                    self.sendFile(self.server.reportServer.createReport(parameters))
+                elif self.path == '/reload':
+                    self.server.reportServer.load()
+                    self.sendJson(200, self.server.reportServer.status())
+                else:
+                    self.sendJson(404, {'error': 'Not found: ' + self.path})
+                # end if
+            except ValueError as error:
+                self.sendJson(400, {'error': str(error)})
+            except Exception as error:
+                self.sendJson(500, {'error': str(error)})
+            # end exception
+        # end def
+    # end class
+
+    return ReportRequestHandler
+# end def
+
+
+def serveReports(settings):
+    # Requests are handled one after the other, they share the indexes of the data source
+    from http.server import HTTPServer
+
+    server = HTTPServer(('127.0.0.1', settings.servePort), createRequestHandler())
+    server.reportServer = ReportServer(settings)
+    colored_print(Fore.GREEN + '\nServing reports on http://127.0.0.1:' + str(settings.servePort) + ' (Ctrl+C to stop)')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    # end exception
+    server.server_close()
 # end def
 
+
 ###############################################################################
 # Main
 ###############################################################################
 
+def generateReport(settings):
+    # Returns False if the PDF could not be compiled
+    # Create data storage and read calibration data, the channel arrays are written while reading
+    cts = CTS(settings)
+    writer = ReportWriter(settings)
+    readCalibrationData(settings, cts, writer)
+
+    # Read Typst template and write the rest of the report
+    template = readTemplate(settings)
+    if writeData(settings, cts, template, writer):
+        colored_print(Fore.GREEN + '\nReport "' + settings.outputFile + '" created sucessfully!')
+    else:
+        colored_print(Fore.BLUE + '\nReport "' + settings.outputFile + '" unchanged, skipped')
+    # end if
+
+    # print('')
+    # print(cts)
+
+    if settings.pdf and not pdfIsCurrent(settings.outputFile):
+        return compileReports(settings, [settings.outputFile])
+    # end if
+    return True
+# end def
+
 def main():
     # Read application settings
     settings = initAndLoadSettings()
 
-    # Create data storage and read calibration data
-    cts = CTS(settings)
-    readCalibrationData(settings, cts)
+    # Profile everything after the settings, so time spent waiting for user input is not included
+    profiler.enabled = settings.profile
+    if settings.cProfileFile is not None:
+        profiler.startCProfile()
+    # end if
 
-    # Read Typst template and write data out
-    template = readTemplate(settings)
-    writeData(settings, cts, template)
+    succeeded = True
+    if settings.check:
+        checkSettings(settings)
+    elif settings.convertTo is not None:
+        convertData(settings)
+    elif settings.factorDiff is not None:
+        generateFactorDiff(settings)
+    elif settings.trendFiles is not None:
+        generateTrend(settings)
+    elif settings.scanFiles is not None:
+        generateScan(settings)
+    elif settings.batchFile is not None:
+        succeeded = generateBatch(settings)
+    elif settings.servePort is not None:
+        serveReports(settings)
+    else:
+        succeeded = generateReport(settings)
+    # end if
 
-    colored_print(Fore.GREEN + '\nReport "' + settings.outputFile + '" created sucessfully!')
+    if settings.profile:
+        profiler.report(settings)
+    # end if
 
-    # print('')
-    # print(cts)
+    # A failed PDF only ends the program after the profile is reported
+    if not succeeded:
+        sys.exit(1)
+    # end if
 #end def
 
 
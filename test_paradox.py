@@ -0,0 +1,127 @@
+#==============================================================================
+# author 			: Andreas Hauser
+# contact 			: andreas_hauser@artc.a-star.edu.sg
+# title				: test_paradox.py
+# description		: ParadoxReader has to decode the records of a Paradox
+#                     table like pypxlib
+# date				: 11/09/2024
+# version			: 1.1.1
+# dependencies		: os, datetime, pytest, report_gen
+# external deps     : pytest
+# usage				: python -m pytest
+# notes				: testdata/fixture.DB was written with pxlib (through
+#                     pypxlib) from fixtureRow, rows FIXTURE_DELETED were
+#                     deleted afterwards, pypxlib reads back the same values
+#                     (except the empty timestamps, which it cannot decode)
+#==============================================================================
+
+import os
+import datetime
+import pytest
+import report_gen
+
+
+###############################################################################
+# Constants definitions
+###############################################################################
+
+FIXTURE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'testdata', 'fixture.DB')
+
+# Fields of the fixture: name, Paradox type, size, the caldata.DB columns come first
+FIXTURE_FIELDS = (('Date', 'Timestamp', 8), ('Channel_Id', 'Alpha', 30), ('No', 'Short', 2), ('Range', 'Alpha', 20),
+                  ('Ref_value', 'Number', 8), ('Meas_value', 'Number', 8), ('Error', 'Number', 8), ('Tolerance', 'Number', 8),
+                  ('Count', 'Long', 4), ('Day', 'Date', 4), ('Flag', 'Logical', 1), ('Clock', 'Time', 4), ('Price', 'Currency', 8))
+
+# Rows written to the fixture and rows deleted afterwards, the data blocks of the fixture are chained and partly empty
+FIXTURE_ROWS = 120
+FIXTURE_DELETED = (3, 17, 40, 41, 42, 77, 119)
+
+
+###############################################################################
+# Helpers
+###############################################################################
+
+def fixtureRow(rowNumber):
+    # Values of a row as written by pxlib, None is an empty field
+    i = rowNumber
+    return (datetime.datetime(2024, 1 + i % 12, 1 + i % 28, i % 24, (i * 7) % 60, (i * 13) % 60, (i % 10) * 100000) if i % 17 != 5 else None,
+            ('%d CH%02d CTS' % (700 + i % 3, i % 32) if i % 23 != 7 else 'Gerät é ' + str(i)) if i % 19 != 3 else None,
+            (i * 37) % 601 - 300 if i % 29 != 11 else None,
+            ('PRE CAL', 'POST CAL', 'ÄÖÜ')[i % 3],
+            (i - 60) * 1.25e-3,
+            (i - 60) * 1.25e-3 + 1e-9 * i,
+            (i % 7 - 3) * 0.1,
+            0.5 * (i % 4),
+            (i * 104729) % 2 ** 31 - 2 ** 30,
+            datetime.date(1990 + i, 1 + i % 12, 1 + i % 28) if i % 13 != 2 else None,
+            (True, False, None)[i % 3],
+            datetime.time(i % 24, i % 60, (i * 3) % 60, (i % 1000) * 1000),
+            (i - 50) * 0.25)
+# end def
+
+def keptRows():
+    return [rowNumber for rowNumber in range(0, FIXTURE_ROWS) if rowNumber not in FIXTURE_DELETED]
+# end def
+
+@pytest.fixture
+def reader():
+    reader = report_gen.ParadoxReader(FIXTURE_FILE)
+    yield reader
+    reader.close()
+# end def
+
+
+###############################################################################
+# Tests
+###############################################################################
+
+def test_header(reader):
+    assert reader.numRecords == len(keptRows())
+    assert list(reader.fields) == [name for name, fieldType, size in FIXTURE_FIELDS]
+# end def
+
+def test_records(reader):
+    # Every field of every record, compared with repr so 0 and None are told apart
+    names = [name for name, fieldType, size in FIXTURE_FIELDS]
+    decoders = [reader.field(name) for name in names]
+    records = list(reader.records())
+    assert len(records) == len(keptRows())
+    for recordOffset, rowNumber in zip(records, keptRows()):
+        values = tuple(decode(reader.buffer[recordOffset + offset:recordOffset + offset + size]) for offset, size, decode in decoders)
+        assert repr(values) == repr(fixtureRow(rowNumber)), rowNumber
+    # end for
+# end def
+
+def test_recordRange(reader):
+    # A range of records starts in the middle of the block chain
+    assert list(reader.records(30, 50)) == list(reader.records())[30:50]
+    assert repr(reader.record(45, ('Channel_Id', 'Ref_value'))) == repr(tuple(fixtureRow(keptRows()[45])[index] for index in (1, 4)))
+# end def
+
+def test_directCalData():
+    # Rows of one device and date range as streamed by the direct reader, the other columns are only decoded for these rows
+    backend = report_gen.ParadoxBackend(FIXTURE_FILE, None, direct=True)
+    dateRange = (datetime.date(2024, 3, 1), datetime.date(2024, 9, 30))
+    rows = list(backend.streamCalData(None, {'701'}, dateRange))
+    backend.close()
+
+    expected = []
+    for rowNumber in keptRows():
+        row = fixtureRow(rowNumber)
+        if row[0] is None or row[1] is None or not row[1].startswith('701 '):
+            continue
+        # end if
+        if row[0].date() < dateRange[0] or row[0].date() > dateRange[1]:
+            continue
+        # end if
+        expected.append((row[0].date(),) + row[1:8])
+    # end for
+    assert len(expected) > 0
+    assert repr(rows) == repr(expected)
+# end def
+
+def test_unsupportedFile():
+    with pytest.raises(ValueError):
+        report_gen.ParadoxReader(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'equipment.ini'))
+    # end with
+# end def
@@ -0,0 +1,124 @@
+#==============================================================================
+# author 			: Andreas Hauser
+# contact 			: andreas_hauser@artc.a-star.edu.sg
+# title				: test_uncertainty.py
+# description		: UncertaintyEngine has to give exactly the uncertainties of
+#                     CTSChannel.getUncertainty
+# date				: 11/09/2024
+# version			: 1.1.1
+# dependencies		: os, pytest, report_gen
+# external deps     : pytest
+# usage				: python -m pytest
+# notes				: Runs with and without numpy, without numpy compute uses
+#                     the scalar calculation itself
+#==============================================================================
+
+import os
+import pytest
+import report_gen
+
+
+###############################################################################
+# Constants definitions
+###############################################################################
+
+EQUIPMENT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'equipment.ini')
+
+# Calibration equipment: name, factor of the shunt value, of the multimeter uncertainties and of the calibrator uncertainty
+EQUIPMENT_VARIANTS = (('equipment file', 1.0, 1.0, 1.0),
+                      ('shunt / 2', 0.5, 1.0, 1.0),
+                      ('shunt x 2', 2.0, 1.0, 1.0),
+                      ('multimeter x 10', 1.0, 10.0, 1.0),
+                      ('calibrator x 10', 1.0, 1.0, 10.0),
+                      ('all / 3', 1.0 / 3, 1.0 / 3, 1.0 / 3))
+
+# Channels per variant, every channel has other reference values for ranges 1 - 21
+NUM_CHANNELS = 50
+
+
+###############################################################################
+# Helpers
+###############################################################################
+
+def createSettings(shuntFactor, multimeterFactor, calibratorFactor):
+    settings = report_gen.Settings()
+    settings.calEquipmentFile = EQUIPMENT_FILE
+    settings.getCalEquipmentFromFile()
+    settings.calValueMOhmCalibrator = settings.calValueMOhmCalibrator * shuntFactor
+    settings.calUncertainty100mVMultimeter = settings.calUncertainty100mVMultimeter * multimeterFactor
+    settings.calUncertainty1VMultimeter = settings.calUncertainty1VMultimeter * multimeterFactor
+    settings.calUncertainty10VMultimeter = settings.calUncertainty10VMultimeter * multimeterFactor
+    settings.calUncertaintyCalibrator = settings.calUncertaintyCalibrator * calibratorFactor
+    return settings
+# end def
+
+def createChannels():
+    # Reference values of both signs and from 1e-3 to 1e4
+    channels = []
+    for channelNumber in range(0, NUM_CHANNELS):
+        channel = report_gen.CTSChannel(channelNumber)
+        for rangeValue in range(1, 22):
+            fraction = ((channelNumber * 2654435761 + rangeValue * 40503) % 4294967296) / 4294967296
+            refValue = (fraction - 0.5) * 10 ** (channelNumber % 8 - 3)
+            channel.addRecord(rangeValue, True, refValue, refValue, 0.0, 1.0)
+            channel.addRecord(rangeValue, False, refValue, refValue, 0.0, 1.0)
+        # end for
+        channels.append(channel)
+    # end for
+    return channels
+# end def
+
+def mismatches(settings, channels):
+    # Post measurements whose uncertainty differs from the scalar calculation
+    result = []
+    for channel in channels:
+        for rangeValue in range(1, 22):
+            record = channel.records[rangeValue]
+            expected = channel.getUncertainty(settings, rangeValue, False, record.refValue)
+            if record.uncertainty != expected:
+                result.append((channel.channelNumber, rangeValue, record.uncertainty, expected))
+            # end if
+        # end for
+    # end for
+    return result
+# end def
+
+
+###############################################################################
+# Tests
+###############################################################################
+
+@pytest.mark.parametrize('name, shuntFactor, multimeterFactor, calibratorFactor', EQUIPMENT_VARIANTS)
+def test_compute(name, shuntFactor, multimeterFactor, calibratorFactor):
+    settings = createSettings(shuntFactor, multimeterFactor, calibratorFactor)
+    channels = createChannels()
+    report_gen.UncertaintyEngine(settings).compute(channels)
+    assert mismatches(settings, channels) == []
+# end def
+
+@pytest.mark.parametrize('name, shuntFactor, multimeterFactor, calibratorFactor', EQUIPMENT_VARIANTS)
+def test_computeChannel(name, shuntFactor, multimeterFactor, calibratorFactor):
+    settings = createSettings(shuntFactor, multimeterFactor, calibratorFactor)
+    channels = createChannels()
+    engine = report_gen.UncertaintyEngine(settings)
+    for channel in channels:
+        engine.computeChannel(channel)
+    # end for
+    assert mismatches(settings, channels) == []
+# end def
+
+def test_preMeasurementsUnchanged():
+    # Only post measurements get an uncertainty
+    settings = createSettings(1.0, 1.0, 1.0)
+    channels = createChannels()
+    engine = report_gen.UncertaintyEngine(settings)
+    engine.compute(channels[:NUM_CHANNELS // 2])
+    for channel in channels[NUM_CHANNELS // 2:]:
+        engine.computeChannel(channel)
+    # end for
+    for channel in channels:
+        for rangeValue in range(101, 122):
+            assert channel.records[rangeValue].uncertainty == 0.0
+        # end for
+    # end for
+# end def